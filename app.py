@@ -8,15 +8,59 @@ from flask import (
     url_for,
     Response,
     make_response,
+    g,
+    has_request_context,
 )
+from flask.sessions import (
+    SecureCookieSession,
+    SecureCookieSessionInterface,
+    SessionInterface,
+)
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.exceptions import ClientDisconnected, RequestEntityTooLarge
 import json
 import os
+import io
+import sys
+import codecs
+import copy
+import csv
+import ctypes
+import glob
+import select
+import shutil
+import struct
+import time
+import threading
+import atexit
+import logging
+import logging.handlers
+import queue
+import re
+import secrets
+import socket
+import uuid
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from html import unescape
+from urllib.parse import urljoin, urlsplit
 import hashlib
-import requests
 import random
 import argparse
 
+try:
+    import fcntl
+except ImportError:  # Windows: only the local coordinator is available
+    fcntl = None
+try:
+    import orjson
+except ImportError:  # Store files and snapshots use the json module instead
+    orjson = None
+
 app = Flask(__name__)
 app.secret_key = "your-secret-key-change-this"  # Change this to a secure secret key
 
@@ -25,126 +69,2477 @@ CONFIG_FILE = "homelab_services.json"
 CALENDAR_CONFIG_FILE = "calendar_config.json"
 SUGGESTIONS_FILE = "suggestions.json"
 DEFAULT_VISIBILITY_FILE = "default_visibility.json"
+NOTES_FILE = "notes.json"
+VISIBILITY_PROFILES_FILE = "visibility_profiles.json"
+VISIBILITY_PROFILE_COOKIE = "homely_profile"
+NUKE_TIMESTAMP_FILE = "nuke_timestamp.txt"
+NUKE_VISIBILITY_TIMESTAMP_FILE = "nuke_visibility_timestamp.txt"
 ADMIN_PASSWORD = "admin123"  # Change this to a secure password
 DEFAULT_SERVICES = []
+VOTE_COOLDOWN = 60  # Seconds between votes on one suggestion by one client
 
 # We'll load the calendar config from the JSON file, no need for defaults here
 
+# Logging
+LOG_LEVEL = "INFO"
+LOG_FILE = None  # Log to stdout unless a file is given
+LOG_QUEUE_SIZE = 10000  # Records beyond this are dropped rather than blocking
+# Access log sampling rate per route; unlisted routes are always logged
+ACCESS_LOG_SAMPLING = {"/api/nuke-timestamp": 0.05}
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+logger = logging.getLogger("homely")
+_log_listener = None
+_log_records_dropped = 0
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Format log records as single-line JSON objects"""
+
+    FIELDS = (
+        "request_id",
+        "method",
+        "route",
+        "path",
+        "status",
+        "duration_ms",
+        "remote_addr",
+        "bytes",
+        "store",
+    )
 
-def load_services():
-    """Load services from JSON file"""
-    try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                # Ensure each service has required properties
-                services = []
-                for service in data.get("services", []):
-                    if "column" not in service:
-                        service["column"] = 0
-                    if "type" not in service:
-                        service["type"] = "url"
-                    if "description" not in service:
-                        service["description"] = ""
-                    services.append(service)
-                return services
-        else:
-            return DEFAULT_SERVICES
-    except Exception as e:
-        print(f"Error loading services: {e}")
-        return DEFAULT_SERVICES
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request ID and route to every log record"""
+
+    def filter(self, record):
+        if has_request_context():
+            if getattr(record, "request_id", None) is None:
+                record.request_id = g.get("request_id")
+            if getattr(record, "route", None) is None and request.url_rule:
+                record.route = request.url_rule.rule
+        return True
 
 
-def save_services(services):
-    """Save services to JSON file"""
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def enqueue(self, record):
+        global _log_records_dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _log_records_dropped += 1
+
+
+def configure_logging(level=LOG_LEVEL, log_file=LOG_FILE):
+    """Route homely, Flask and werkzeug logs through a background JSON writer"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+
+    if log_file:
+        sink = logging.FileHandler(log_file, encoding="utf-8")
+    else:
+        sink = logging.StreamHandler(sys.stdout)
+    sink.setFormatter(logging.Formatter("%(message)s"))
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(log_queue)
+    handler.setFormatter(JsonLogFormatter())
+    handler.addFilter(RequestContextFilter())
+
+    for name in ("homely", "werkzeug", app.logger.name):
+        target = logging.getLogger(name)
+        target.handlers = [handler]
+        target.propagate = False
+    logger.setLevel(level)
+    # Access lines come from log_request; werkzeug only reports problems
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    _log_listener = logging.handlers.QueueListener(log_queue, sink)
+    _log_listener.start()
+
+
+def _stop_logging():
+    if _log_listener is not None:
+        _log_listener.stop()
+
+
+atexit.register(_stop_logging)
+
+
+def error_response(e, status=500):
+    """Log an unexpected exception with its traceback and return a JSON error"""
+    logger.exception("Error handling %s %s", request.method, request.path)
+    return jsonify(
+        {"success": False, "error": str(e), "request_id": g.get("request_id")}
+    ), status
+
+
+# Metrics
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PROCESS_START_TIME = time.time()
+
+_metrics_lock = threading.Lock()
+_request_counts = {}  # (method, route, status) -> count
+_request_latency = {}  # (method, route) -> histogram
+_store_io_counts = {}  # (store, op, result) -> count
+_store_io_latency = {}  # (store, op) -> histogram
+_store_io_bytes = {}  # (store, op) -> total bytes
+_store_last_bytes = {}  # store -> size of the last successful load/save
+_cache_lookups = {}  # (cache, result) -> count
+_open_connections = {}  # kind -> currently open
+
+
+def _new_histogram():
+    """Create an empty latency histogram: per-bucket counts, sum and count"""
+    return {"buckets": [0] * len(METRICS_LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+
+
+def _observe_histogram(histogram, value):
+    """Add a single observation to a histogram"""
+    for i, bound in enumerate(METRICS_LATENCY_BUCKETS):
+        if value <= bound:
+            histogram["buckets"][i] += 1
+    histogram["sum"] += value
+    histogram["count"] += 1
+
+
+def observe_request(method, route, status, duration):
+    """Record one handled HTTP request"""
+    with _metrics_lock:
+        key = (method, route, status)
+        _request_counts[key] = _request_counts.get(key, 0) + 1
+        histogram = _request_latency.get((method, route))
+        if histogram is None:
+            histogram = _request_latency[(method, route)] = _new_histogram()
+        _observe_histogram(histogram, duration)
+
+
+def observe_store_io(store, op, duration, nbytes, ok):
+    """Record one JSON store load or save"""
+    with _metrics_lock:
+        key = (store, op, "success" if ok else "error")
+        _store_io_counts[key] = _store_io_counts.get(key, 0) + 1
+        histogram = _store_io_latency.get((store, op))
+        if histogram is None:
+            histogram = _store_io_latency[(store, op)] = _new_histogram()
+        _observe_histogram(histogram, duration)
+        _store_io_bytes[(store, op)] = _store_io_bytes.get((store, op), 0) + nbytes
+        if ok:
+            _store_last_bytes[store] = nbytes
+
+
+def observe_cache_lookup(cache, hit):
+    """Record a hit or miss on one of the in-memory caches"""
+    with _metrics_lock:
+        key = (cache, "hit" if hit else "miss")
+        _cache_lookups[key] = _cache_lookups.get(key, 0) + 1
+
+
+@contextmanager
+def track_connection(kind):
+    """Count a long-lived (streaming/proxy) connection while it is open"""
+    with _metrics_lock:
+        _open_connections[kind] = _open_connections.get(kind, 0) + 1
+    try:
+        yield
+    finally:
+        with _metrics_lock:
+            _open_connections[kind] -= 1
+
+
+def get_process_rss_bytes():
+    """Current resident set size of this process, or None if unavailable"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
     try:
-        # Create backup
-        if os.path.exists(CONFIG_FILE):
-            backup_file = (
-                f"{CONFIG_FILE}.backup.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        import resource
+
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def _format_labels(**labels):
+    """Render a Prometheus label set"""
+    parts = []
+    for name, value in labels.items():
+        value = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _render_histogram(lines, name, histograms, label_names):
+    """Append the exposition lines of a labelled histogram family"""
+    for label_values, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, label_values))
+        for bound, count in zip(METRICS_LATENCY_BUCKETS, histogram["buckets"]):
+            lines.append(f"{name}_bucket{_format_labels(**labels, le=bound)} {count}")
+        lines.append(
+            f"{name}_bucket{_format_labels(**labels, le='+Inf')} {histogram['count']}"
+        )
+        lines.append(f"{name}_sum{_format_labels(**labels)} {histogram['sum']:.6f}")
+        lines.append(f"{name}_count{_format_labels(**labels)} {histogram['count']}")
+
+
+def render_metrics():
+    """Render all collected metrics in the Prometheus text exposition format"""
+    lines = []
+    with _metrics_lock:
+        lines.append("# HELP homely_http_requests_total HTTP requests handled.")
+        lines.append("# TYPE homely_http_requests_total counter")
+        for (method, route, status), count in sorted(_request_counts.items()):
+            labels = _format_labels(method=method, route=route, status=status)
+            lines.append(f"homely_http_requests_total{labels} {count}")
+
+        lines.append(
+            "# HELP homely_http_request_duration_seconds HTTP request latency."
+        )
+        lines.append("# TYPE homely_http_request_duration_seconds histogram")
+        _render_histogram(
+            lines,
+            "homely_http_request_duration_seconds",
+            _request_latency,
+            ("method", "route"),
+        )
+
+        lines.append("# HELP homely_store_operations_total JSON store loads/saves.")
+        lines.append("# TYPE homely_store_operations_total counter")
+        for (store, op, result), count in sorted(_store_io_counts.items()):
+            labels = _format_labels(store=store, op=op, result=result)
+            lines.append(f"homely_store_operations_total{labels} {count}")
+
+        lines.append(
+            "# HELP homely_store_operation_duration_seconds JSON store load/save latency."
+        )
+        lines.append("# TYPE homely_store_operation_duration_seconds histogram")
+        _render_histogram(
+            lines,
+            "homely_store_operation_duration_seconds",
+            _store_io_latency,
+            ("store", "op"),
+        )
+
+        lines.append(
+            "# HELP homely_store_bytes_total Bytes read from/written to stores."
+        )
+        lines.append("# TYPE homely_store_bytes_total counter")
+        for (store, op), nbytes in sorted(_store_io_bytes.items()):
+            labels = _format_labels(store=store, op=op)
+            lines.append(f"homely_store_bytes_total{labels} {nbytes}")
+
+        lines.append(
+            "# HELP homely_store_size_bytes Size of the last loaded/saved store."
+        )
+        lines.append("# TYPE homely_store_size_bytes gauge")
+        for store, nbytes in sorted(_store_last_bytes.items()):
+            lines.append(
+                f"homely_store_size_bytes{_format_labels(store=store)} {nbytes}"
             )
-            os.rename(CONFIG_FILE, backup_file)
 
-            # Keep only last 5 backups
-            backup_files = sorted(
-                [f for f in os.listdir(".") if f.startswith(f"{CONFIG_FILE}.backup.")]
+        lines.append("# HELP homely_cache_lookups_total In-memory cache lookups.")
+        lines.append("# TYPE homely_cache_lookups_total counter")
+        for (cache, result), count in sorted(_cache_lookups.items()):
+            labels = _format_labels(cache=cache, result=result)
+            lines.append(f"homely_cache_lookups_total{labels} {count}")
+
+        lines.append("# HELP homely_cache_hit_ratio Hits over lookups per cache.")
+        lines.append("# TYPE homely_cache_hit_ratio gauge")
+        for cache in sorted({cache for cache, _ in _cache_lookups}):
+            hits = _cache_lookups.get((cache, "hit"), 0)
+            total = hits + _cache_lookups.get((cache, "miss"), 0)
+            lines.append(
+                f"homely_cache_hit_ratio{_format_labels(cache=cache)} {hits / total:.6f}"
             )
-            for backup in backup_files[:-5]:
-                os.remove(backup)
 
-        # Save new data
-        data = {"services": services, "last_updated": datetime.now().isoformat()}
+        lines.append("# HELP homely_open_connections Open streaming/proxy connections.")
+        lines.append("# TYPE homely_open_connections gauge")
+        for kind, count in sorted(_open_connections.items()):
+            lines.append(f"homely_open_connections{_format_labels(kind=kind)} {count}")
 
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        return True
+    rss = get_process_rss_bytes()
+    if rss is not None:
+        lines.append(
+            "# HELP homely_process_resident_memory_bytes Resident memory size."
+        )
+        lines.append("# TYPE homely_process_resident_memory_bytes gauge")
+        lines.append(f"homely_process_resident_memory_bytes {rss}")
+    lines.append("# HELP homely_process_start_time_seconds Process start (unix time).")
+    lines.append("# TYPE homely_process_start_time_seconds gauge")
+    lines.append(f"homely_process_start_time_seconds {PROCESS_START_TIME:.3f}")
+    lines.append(
+        "# HELP homely_log_records_dropped_total Log records lost to a full queue."
+    )
+    lines.append("# TYPE homely_log_records_dropped_total counter")
+    lines.append(f"homely_log_records_dropped_total {_log_records_dropped}")
+    lines.append("# HELP homely_process_threads Live Python threads.")
+    lines.append("# TYPE homely_process_threads gauge")
+    lines.append(f"homely_process_threads {threading.active_count()}")
+    return "\n".join(lines) + "\n"
+
+
+# Profiling (opt-in, see enable_profiling)
+PROFILE_DIR = "profiles"
+PROFILE_KEEP = 20  # Most recent profiles kept in PROFILE_DIR
+PROFILE_SAMPLE_INTERVAL = 0.001  # Seconds between stack samples
+PROFILE_SAMPLE_RATE = 0.0  # Fraction of all requests profiled at random
+
+_profile_lock = threading.Lock()  # cProfile can only profile one request at a time
+
+
+def _profile_requested():
+    """Whether the current request should be profiled"""
+    explicit = (
+        request.args.get("profile") == "1"
+        or request.headers.get("X-Homely-Profile") == "1"
+    )
+    if explicit:
+        return check_admin_auth()
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _sample_stacks(thread_id, stop_event, stacks):
+    """Collect collapsed call stacks of one thread until stop_event is set"""
+    while not stop_event.wait(PROFILE_SAMPLE_INTERVAL):
+        frame = sys._current_frames().get(thread_id)
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+            )
+            frame = frame.f_back
+        if names:
+            stack = ";".join(reversed(names))
+            stacks[stack] = stacks.get(stack, 0) + 1
+
+
+def start_request_profile():
+    """Start cProfile and the stack sampler for a profiled request"""
+    if not _profile_requested() or not _profile_lock.acquire(blocking=False):
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler (e.g. a debugger) is already active
+        _profile_lock.release()
+        return
+    stacks = {}
+    stop_event = threading.Event()
+    sampler = threading.Thread(
+        target=_sample_stacks,
+        args=(threading.get_ident(), stop_event, stacks),
+        daemon=True,
+    )
+    sampler.start()
+    g.profile = {
+        "profiler": profiler,
+        "stacks": stacks,
+        "stop_event": stop_event,
+        "sampler": sampler,
+        "started": time.perf_counter(),
+    }
+
+
+def finish_request_profile(response):
+    """Stop profiling and write the pstats and collapsed-stack output"""
+    profile = g.pop("profile", None)
+    if profile is None:
+        return response
+    try:
+        profile["profiler"].disable()
+        duration = time.perf_counter() - profile["started"]
+        profile["stop_event"].set()
+        profile["sampler"].join()
+        save_profile(profile, response.status_code, duration)
+    except Exception:
+        logger.exception("Error saving profile")
+    finally:
+        _profile_lock.release()
+    return response
+
+
+def save_profile(profile, status, duration):
+    """Write one request profile into PROFILE_DIR, pruning the oldest ones"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    route = request.url_rule.rule if request.url_rule else request.path
+    slug = "".join(c if c.isalnum() else "_" for c in route).strip("_") or "root"
+    name = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{request.method}_{slug}"
+    base = os.path.join(PROFILE_DIR, name)
+
+    profile["profiler"].dump_stats(f"{base}.pstats")
+    with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+        f.writelines(
+            f"{stack} {count}\n" for stack, count in sorted(profile["stacks"].items())
+        )
+    meta = {
+        "name": name,
+        "method": request.method,
+        "route": route,
+        "path": request.path,
+        "status": status,
+        "duration_ms": round(duration * 1000, 3),
+        "samples": sum(profile["stacks"].values()),
+        "created_at": datetime.now().isoformat(),
+    }
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    # Ring buffer: keep only the most recent PROFILE_KEEP profiles
+    names = sorted(f[:-5] for f in os.listdir(PROFILE_DIR) if f.endswith(".json"))
+    for old in names[:-PROFILE_KEEP]:
+        for ext in (".json", ".pstats", ".collapsed"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, filename), "r", encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def enable_profiling(sample_rate=0.0):
+    """Register the profiling hooks; without this call profiling costs nothing"""
+    global PROFILE_SAMPLE_RATE
+    PROFILE_SAMPLE_RATE = max(0.0, min(1.0, sample_rate))
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+
+
+# Health
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+HEALTH_DEEP_MIN_INTERVAL = 30  # Seconds between full ?deep=1 store validations
+
+_store_status_lock = threading.Lock()
+_store_status = {}  # store -> version, size and last load/save/error times
+_deep_health = {"checked_at": 0.0, "result": None}
+_deep_health_lock = threading.Lock()
+# Top-level JSON type of each JSON store file
+STORE_FILE_TYPES = {
+    "services": dict,
+    "calendar_config": dict,
+    "suggestions": list,
+    "default_visibility": dict,
+    "notes": dict,
+    "visibility_profiles": dict,
+}
+
+
+def get_store_files():
+    """Map of store name to the JSON file backing it"""
+    return {
+        "services": CONFIG_FILE,
+        "calendar_config": CALENDAR_CONFIG_FILE,
+        "suggestions": SUGGESTIONS_FILE,
+        "default_visibility": DEFAULT_VISIBILITY_FILE,
+        "notes": NOTES_FILE,
+        "visibility_profiles": VISIBILITY_PROFILES_FILE,
+    }
+
+
+def update_store_status(store, op=None, raw=None, error=None, **fields):
+    """Remember the outcome of the latest load/save of a store"""
+    now = datetime.now().isoformat()
+    with _store_status_lock:
+        status = _store_status.setdefault(
+            store,
+            {
+                "version": None,
+                "bytes": None,
+                "last_load": None,
+                "last_save": None,
+                "last_error": None,
+                "last_error_at": None,
+            },
+        )
+        if error is not None:
+            status["last_error"] = f"{op}: {error}"
+            status["last_error_at"] = now
+        elif op is not None:
+            status["version"] = hashlib.blake2b(raw, digest_size=8).hexdigest()
+            status["bytes"] = len(raw)
+            status[f"last_{op}"] = now
+            status["last_error"] = None
+        status.update(fields)
+
+
+def get_store_status():
+    """Snapshot of the in-memory store status"""
+    with _store_status_lock:
+        return {store: dict(status) for store, status in _store_status.items()}
+
+
+def store_version(store):
+    """Content version of the in-memory copy of a store"""
+    entry = _stores.get(store)
+    return (entry and entry["version"]) or "empty"
+
+
+def count_backups():
+    """Number of services backups currently on disk"""
+    prefix = f"{os.path.basename(CONFIG_FILE)}.backup."
+    directory = os.path.dirname(CONFIG_FILE) or "."
+    return len([f for f in os.listdir(directory) if f.startswith(prefix)])
+
+
+def validate_store_files():
+    """Fully re-read, parse and sanity-check every store file"""
+    expected_types = STORE_FILE_TYPES
+    results = {}
+    for store, path in get_store_files().items():
+        result = {"file": path, "exists": os.path.exists(path), "ok": True}
+        if result["exists"]:
+            try:
+                data = read_json_file(store, path, expected_types[store]())
+                if not isinstance(data, expected_types[store]):
+                    raise TypeError(f"expected a JSON {expected_types[store].__name__}")
+                if store == "services" and not isinstance(data.get("services"), list):
+                    raise TypeError('"services" must be a list')
+            except (OSError, ValueError, TypeError) as e:
+                result["ok"] = False
+                result["error"] = str(e)
+        results[store] = result
+    update_store_status("services", backups=count_backups())
+    return results
+
+
+def run_deep_health_check(force=False):
+    """Full store validation, rate-limited to once per HEALTH_DEEP_MIN_INTERVAL"""
+    with _deep_health_lock:
+        age = time.monotonic() - _deep_health["checked_at"]
+        if _deep_health["result"] is not None and (
+            age < HEALTH_DEEP_MIN_INTERVAL and not force
+        ):
+            return _deep_health["result"], round(age, 3), True
+        _deep_health["result"] = validate_store_files()
+        _deep_health["checked_at"] = time.monotonic()
+        return _deep_health["result"], 0.0, False
+
+
+def parse_json_bytes(raw):
+    """Parse JSON, with orjson when it is installed"""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def compact_json_bytes(data):
+    """Serialize data as compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def read_json_file(store, path, empty=None):
+    """Read and parse a JSON store file, recording I/O metrics
+
+    A blank file is not an error and yields ``empty`` instead.
+    """
+    start = time.perf_counter()
+    raw = b""
+    ok = False
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = parse_json_bytes(raw) if raw.strip() else empty
+        ok = True
+        update_store_status(store, "load", raw)
+        return data
     except Exception as e:
-        print(f"Error saving services: {e}")
-        return False
+        update_store_status(store, "load", error=e)
+        raise
+    finally:
+        observe_store_io(store, "load", time.perf_counter() - start, len(raw), ok)
 
 
-def load_calendar_config():
-    """Load calendar configuration from JSON file"""
+def write_json_file(store, path, data):
+    """Serialize and write a JSON store file, recording I/O metrics"""
+    start = time.perf_counter()
+    raw = b""
+    ok = False
     try:
-        if os.path.exists(CALENDAR_CONFIG_FILE):
-            with open(CALENDAR_CONFIG_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        else:
-            # If no config file exists, create it with the default from our separate config file
-            print(
-                f"Calendar config file not found. Please ensure {CALENDAR_CONFIG_FILE} exists."
-            )
-            return {"months": {}, "quotes": [], "siteTitle": "BCOS"}
+        raw = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+        # Write a sibling file and rename it over the original, so neither
+        # readers nor the store watcher ever see a half-written file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(raw)
+        os.replace(temp_path, path)
+        ok = True
+        update_store_status(store, "save", raw)
     except Exception as e:
-        print(f"Error loading calendar config: {e}")
+        update_store_status(store, "save", error=e)
+        raise
+    finally:
+        observe_store_io(store, "save", time.perf_counter() - start, len(raw), ok)
+
+
+# In-memory stores
+#
+# Request handlers read the data files through in-memory copies. A
+# background watcher notices when a file changes on disk (inotify on Linux,
+# polling elsewhere), waits for writes to settle, re-parses and validates
+# the file once and swaps the new copy in. Saves refresh their store
+# directly. Listeners registered with on_store_change hear about every swap.
+STORE_WATCH_DEBOUNCE = 0.5  # Seconds a file must stay quiet before reloading
+STORE_POLL_INTERVAL = 2.0  # Used when inotify is not available
+INOTIFY_EVENTS = (
+    0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+)  # Writes, renames, create, delete
+INOTIFY_OVERFLOW = 0x4000
+_stores = {}  # store -> {"data", "version", "signature"}
+_store_reload_lock = threading.RLock()  # Reloads happen one at a time
+_store_listeners = []  # Registered at import time, so iterated without a copy
+_store_watcher = None
+_store_watcher_stop = threading.Event()
+
+
+def get_store_specs():
+    """Map of store name to (files, reader, fallback, validator)"""
+    return {
+        "services": (
+            (CONFIG_FILE,),
+            read_services_file,
+            lambda: list(DEFAULT_SERVICES),
+            check_services_store,
+        ),
+        "calendar_config": (
+            (CALENDAR_CONFIG_FILE,),
+            read_calendar_config_file,
+            lambda: {"months": {}, "quotes": [], "siteTitle": "BCOS"},
+            check_calendar_config_store,
+        ),
+        "suggestions": ((SUGGESTIONS_FILE,), read_suggestions_file, list, None),
+        "default_visibility": (
+            (DEFAULT_VISIBILITY_FILE,),
+            read_default_visibility_file,
+            dict,
+            None,
+        ),
+        "notes": ((NOTES_FILE,), read_notes_file, dict, None),
+        "visibility_profiles": (
+            (VISIBILITY_PROFILES_FILE,),
+            read_visibility_profiles_file,
+            dict,
+            check_visibility_profiles_store,
+        ),
+        "nuke": (
+            (NUKE_TIMESTAMP_FILE, NUKE_VISIBILITY_TIMESTAMP_FILE),
+            read_nuke_timestamps,
+            lambda: {"timestamp": None, "visibility_timestamp": None},
+            None,
+        ),
+    }
+
+
+def files_signature(paths):
+    """Cheap fingerprint of files that changes whenever one of them does"""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def get_store(store):
+    """In-memory data of a store; shared between requests, so read only"""
+    entry = _stores.get(store)
+    if entry is None:
+        entry = reload_store(store)
+    return entry["data"]
+
+
+def on_store_change(callback):
+    """Call callback(store) whenever a store's in-memory copy is replaced"""
+    _store_listeners.append(callback)
+    return callback
+
+
+def reload_store(store, force=False):
+    """Re-read a store if its files changed, validate it and swap it in
+
+    A file that fails to parse or validate is rejected and the previous
+    copy keeps being served; with no previous copy the store falls back
+    to its defaults (parse errors) or loads anyway (validation errors).
+    """
+    paths, reader, fallback, validator = get_store_specs()[store]
+    with _store_reload_lock:
+        current = _stores.get(store)
+        signature = files_signature(paths)
+        if current is not None and not force and current["signature"] == signature:
+            return current
+
+        try:
+            data = reader()
+        except Exception as e:
+            if current is not None:
+                logger.error("Keeping the previous %s, reload failed: %s", store, e)
+                _stores[store] = dict(current, signature=signature)
+                return current
+            logger.exception("Error loading %s", store)
+            data = fallback()
+
+        errors = validator(data) if validator else []
+        if errors:
+            summary = "; ".join(errors[:5])
+            if current is not None:
+                logger.error(
+                    "Keeping the previous %s, new file is invalid: %s", store, summary
+                )
+                update_store_status(
+                    store, "load", error=summary, version=current["version"]
+                )
+                _stores[store] = dict(current, signature=signature)
+                return current
+            logger.warning("Loaded %s with validation errors: %s", store, summary)
+
+        with _store_status_lock:
+            version = _store_status.get(store, {}).get("version")
+        entry = {"data": data, "version": version, "signature": signature}
+        _stores[store] = entry  # A single assignment, so readers see old or new
+
+    if current is not None:
+        logger.info("Reloaded %s", store, extra={"store": store})
+        for callback in _store_listeners:
+            try:
+                callback(store)
+            except Exception:
+                logger.exception("Store change listener failed for %s", store)
+    return entry
+
+
+def open_inotify(directories):
+    """Non-blocking inotify descriptor watching directories, and its watches
+
+    Returns (None, {}) where inotify is not available.
+    """
+    if not sys.platform.startswith("linux"):
+        return None, {}
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None, {}
+    if fd < 0:
+        return None, {}
+
+    watches = {}
+    for directory in directories:
+        wd = libc.inotify_add_watch(fd, os.fsencode(directory), INOTIFY_EVENTS)
+        if wd < 0:
+            os.close(fd)
+            return None, {}
+        watches[wd] = directory
+    return fd, watches
+
+
+def read_inotify_events(fd, watches, timeout):
+    """Wait up to timeout seconds for (directory, name) pairs that changed
+
+    None in the result means events were lost and everything may have changed.
+    """
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if not ready:
+        return set()
+    try:
+        buffer = os.read(fd, 64 * 1024)
+    except BlockingIOError:
+        return set()
+
+    touched = set()
+    offset = 0
+    while offset + 16 <= len(buffer):
+        wd, mask, _cookie, length = struct.unpack_from("iIII", buffer, offset)
+        name = buffer[offset + 16 : offset + 16 + length].split(b"\0", 1)[0]
+        offset += 16 + length
+        if mask & INOTIFY_OVERFLOW:
+            touched.add(None)
+        elif wd in watches:
+            touched.add((watches[wd], os.fsdecode(name)))
+    return touched
+
+
+def watch_stores(stop):
+    """Watcher thread: reload stores whose files changed, once they settle"""
+    specs = get_store_specs()
+    targets = {}
+    for store, (paths, *_rest) in specs.items():
+        for path in paths:
+            targets[os.path.split(os.path.abspath(path))] = store
+    fd, watches = open_inotify({directory for directory, _ in targets})
+    logger.info("Watching data files (%s)", "inotify" if fd is not None else "polling")
+
+    seen = {store: files_signature(spec[0]) for store, spec in specs.items()}
+    pending = {}  # store -> monotonic time it is due for a reload
+    try:
+        while not stop.is_set():
+            try:
+                timeout = STORE_POLL_INTERVAL
+                if pending:
+                    timeout = max(
+                        0.0, min(min(pending.values()) - time.monotonic(), timeout)
+                    )
+
+                changed = set()
+                if fd is not None:
+                    for target in read_inotify_events(fd, watches, timeout):
+                        if target is None:
+                            changed.update(specs)
+                        elif target in targets:
+                            changed.add(targets[target])
+                else:
+                    stop.wait(timeout)
+                    for store, spec in specs.items():
+                        signature = files_signature(spec[0])
+                        if signature != seen[store]:
+                            seen[store] = signature
+                            changed.add(store)
+
+                # Every new event pushes the reload back, so a file that is
+                # still being written is only parsed once it is complete
+                due_at = time.monotonic() + STORE_WATCH_DEBOUNCE
+                for store in changed:
+                    pending[store] = due_at
+                now = time.monotonic()
+                for store in [s for s, due in pending.items() if due <= now]:
+                    del pending[store]
+                    reload_store(store)
+            except Exception:
+                logger.exception("Store watcher error")
+                stop.wait(STORE_POLL_INTERVAL)
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+
+def start_store_watcher():
+    """Load every store into memory and start watching their files"""
+    global _store_watcher
+    if _store_watcher is not None:
+        return
+    for store in get_store_specs():
+        reload_store(store)
+    _store_watcher_stop.clear()
+    _store_watcher = threading.Thread(
+        target=watch_stores,
+        args=(_store_watcher_stop,),
+        name="store-watcher",
+        daemon=True,
+    )
+    _store_watcher.start()
+
+
+def stop_store_watcher():
+    """Stop the store watcher thread"""
+    global _store_watcher
+    if _store_watcher is None:
+        return
+    _store_watcher_stop.set()
+    _store_watcher.join(timeout=STORE_POLL_INTERVAL + 1)
+    _store_watcher = None
+
+
+atexit.register(stop_store_watcher)
+
+
+# Multi-instance coordination
+#
+# Nodes behind a load balancer share store changes (including nukes) and
+# vote cooldowns through a coordinator. LocalCoordinator keeps everything
+# in-process for a single node; SharedDirectoryCoordinator works through a
+# directory every node can reach and delivers changes to the other nodes
+# within COORDINATION_POLL_INTERVAL (sooner where inotify is available).
+COORDINATION_DIR = None  # Shared directory, or None for a single node
+COORDINATION_POLL_INTERVAL = 1.0
+COORDINATION_EVENT_TTL = 300  # Seconds before broadcast events are pruned
+_coordination_state = threading.local()  # Marks store reloads caused by peers
+
+
+class LocalCoordinator:
+    """Coordinator for a single node: events stay local, cooldowns in memory
+
+    Other backends override publish, acquire_cooldown, put_store, get_store,
+    start and stop, set shared, and hand events from other nodes to
+    deliver().
+    """
+
+    shared = False  # Whether other nodes read what this one publishes
+
+    def __init__(self):
+        self._subscribers = []
+        self._cooldowns = {}
+        self._cooldowns_lock = threading.Lock()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def subscribe(self, callback):
+        """Call callback(event) for every event published by another node"""
+        self._subscribers.append(callback)
+
+    def publish(self, event):
+        """Send an event to every other node"""
+
+    def put_store(self, store, revision, files):
+        """Keep a store's files where the other nodes can read them"""
+
+    def get_store(self, store):
+        """(node, revision, files) last put for the store, or None"""
+
+    def deliver(self, event):
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Coordination event handler failed")
+
+    def acquire_cooldown(self, key, seconds):
+        """Start a cooldown for key; seconds left if one is already running"""
+        now = time.time()
+        with self._cooldowns_lock:
+            remaining = self._cooldowns.get(key, 0) - now
+            if remaining > 0:
+                return remaining
+            self._cooldowns = {k: t for k, t in self._cooldowns.items() if t > now}
+            self._cooldowns[key] = now + seconds
+            return 0
+
+
+class SharedDirectoryCoordinator(LocalCoordinator):
+    """Coordinator backed by a directory shared by all nodes
+
+    Events are small JSON files under events/, written atomically and
+    pruned after COORDINATION_EVENT_TTL. A changed store's files are kept
+    once under stores/, so events only name the store and revision, and a
+    node that falls behind reads the latest files once. Cooldowns live in
+    cooldowns.json, updated under an exclusive lock.
+    """
+
+    shared = True
+
+    def __init__(self, directory):
+        if fcntl is None:
+            raise RuntimeError("Shared-directory coordination needs fcntl (POSIX)")
+        super().__init__()
+        self.directory = directory
+        self.events_dir = os.path.join(directory, "events")
+        self.stores_dir = os.path.join(directory, "stores")
+        self.node = re.sub(r"[^A-Za-z0-9_.-]", "-", WORKER_ID)
+        self._sequence = 0
+        self._seen = {}  # event file name -> time it was first seen
+        self._lock = threading.Lock()  # Publishers and the poller share both
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(self.events_dir, exist_ok=True)
+        os.makedirs(self.stores_dir, exist_ok=True)
+
+    def start(self):
+        # Events from before this node started are already on disk or stale
+        now = time.time()
+        seen = {name: now for name in self._event_names()}
+        with self._lock:
+            self._seen = seen
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="coordinator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=COORDINATION_POLL_INTERVAL + 1)
+            self._thread = None
+
+    def publish(self, event):
+        with self._lock:
+            self._sequence += 1
+            name = f"{time.time_ns():020d}-{self.node}-{self._sequence}.json"
+            self._seen[name] = time.time()
+        path = os.path.join(self.events_dir, name)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(dict(event, node=WORKER_ID), f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+
+    def put_store(self, store, revision, files):
+        path = os.path.join(self.stores_dir, f"{store}.json")
+        shared = {"node": WORKER_ID, "revision": revision, "files": files}
+        with open(f"{path}.{self.node}.tmp", "w", encoding="utf-8") as f:
+            json.dump(shared, f, ensure_ascii=False)
+        os.replace(f"{path}.{self.node}.tmp", path)
+
+    def get_store(self, store):
+        try:
+            with open(
+                os.path.join(self.stores_dir, f"{store}.json"), encoding="utf-8"
+            ) as f:
+                shared = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return shared["node"], shared["revision"], shared["files"]
+
+    def acquire_cooldown(self, key, seconds):
+        now = time.time()
+        path = os.path.join(self.directory, "cooldowns.json")
+        with open(os.path.join(self.directory, "cooldowns.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    cooldowns = json.load(f)
+            except (FileNotFoundError, ValueError):
+                cooldowns = {}
+            remaining = cooldowns.get(key, 0) - now
+            if remaining > 0:
+                return remaining
+            cooldowns = {k: t for k, t in cooldowns.items() if t > now}
+            cooldowns[key] = now + seconds
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(cooldowns, f)
+            os.replace(f"{path}.tmp", path)
+            return 0
+
+    def _event_names(self):
+        return sorted(
+            os.path.basename(path)
+            for path in glob.glob(os.path.join(self.events_dir, "*.json"))
+        )
+
+    def _run(self):
+        fd, watches = open_inotify({self.events_dir})
+        try:
+            while not self._stop.is_set():
+                try:
+                    if fd is not None:
+                        read_inotify_events(fd, watches, COORDINATION_POLL_INTERVAL)
+                    else:
+                        self._stop.wait(COORDINATION_POLL_INTERVAL)
+                    self._poll()
+                except Exception:
+                    logger.exception("Coordinator error")
+                    self._stop.wait(COORDINATION_POLL_INTERVAL)
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _poll(self):
+        """Deliver new events from other nodes and prune expired ones"""
+        now = time.time()
+        for name in self._event_names():
+            with self._lock:
+                if name in self._seen:
+                    continue
+                self._seen[name] = now
+            try:
+                with open(os.path.join(self.events_dir, name), encoding="utf-8") as f:
+                    event = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue  # Pruned by another node, or not ours to read
+            if event.get("node") != WORKER_ID:
+                self.deliver(event)
+
+        with self._lock:
+            expired = [
+                name
+                for name, first_seen in self._seen.items()
+                if now - first_seen > COORDINATION_EVENT_TTL
+            ]
+            for name in expired:
+                del self._seen[name]
+        for name in expired:
+            try:
+                os.remove(os.path.join(self.events_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+coordinator = LocalCoordinator()
+
+
+def broadcast_store_change(store):
+    """Store change listener: tell the other nodes what changed
+
+    The store's files are put once where the other nodes read them; the
+    event itself only carries the revision and the changed entity keys.
+    """
+    if not coordinator.shared or getattr(_coordination_state, "applying", False):
+        return  # A single node, or the change came from another node
+    revision, changed = latest_change(store)
+    files = []
+    for path in get_store_specs()[store][0]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                files.append(f.read())
+        except FileNotFoundError:
+            files.append(None)
+    coordinator.put_store(store, revision, files)
+    coordinator.publish(
+        {"type": "store", "store": store, "revision": revision, "changed": changed}
+    )
+
+
+_applied_store_changes = {}  # store -> (node, revision) of the files applied last
+
+
+def store_write_lock(store):
+    """Lock serializing read-modify-writes of a store, if it has one"""
+    locks = {
+        "services": _services_lock,
+        "calendar_config": _calendar_lock,
+        "suggestions": _suggestions_lock,
+        "notes": _notes_lock,
+    }
+    return locks.get(store) or nullcontext()
+
+
+def apply_store_event(event):
+    """Write the latest files of a store changed by another node and swap them in
+
+    Several events for one store are applied once, from the latest files.
+    The store's write lock is held throughout, so a save in progress on
+    this node finishes first instead of writing over the peer's change.
+    """
+    specs = get_store_specs()
+    if event.get("type") != "store" or event.get("store") not in specs:
+        return
+    store = event["store"]
+    _coordination_state.applying = True
+    try:
+        with store_write_lock(store), _store_reload_lock:
+            shared = coordinator.get_store(store)
+            if shared is None or _applied_store_changes.get(store) == shared[:2]:
+                return
+            node, revision, files = shared
+            if store == "services":
+                backup_services_file()
+            for path, content in zip(specs[store][0], files):
+                if content is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                    continue
+                with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                    f.write(content)
+                os.replace(f"{path}.tmp", path)
+            _applied_store_changes[store] = (node, revision)
+            reload_store(store, force=True)
+        logger.info(
+            "Applied %s change %s from %s",
+            store,
+            revision,
+            node,
+            extra={"store": store, "changed": event.get("changed")},
+        )
+    finally:
+        _coordination_state.applying = False
+
+
+def configure_coordination(directory=None):
+    """Switch to the shared-directory coordinator, or back to a local one"""
+    global coordinator
+    coordinator.stop()
+    if directory:
+        coordinator = SharedDirectoryCoordinator(directory)
+    else:
+        coordinator = LocalCoordinator()
+    coordinator.subscribe(apply_store_event)
+    coordinator.start()
+
+
+atexit.register(lambda: coordinator.stop())
+
+
+# Change feed
+#
+# Every swap of a store's in-memory copy (saves, votes, nukes, edits on
+# disk, changes from other nodes) takes the next global revision, and the
+# entities it touched are found by comparing per-entity digests. Clients
+# ask /api/changes?since=<rev> what changed after a revision they saw and
+# refetch only that. Revisions start at the boot time in milliseconds, so
+# they keep increasing across restarts; a cursor from before a restart or
+# older than the retained log gets a reset instead. Each node numbers its
+# own revisions.
+CHANGE_LOG_SIZE = 1000
+_change_lock = threading.Lock()
+_change_log = deque(maxlen=CHANGE_LOG_SIZE)  # (revision, store, keys or None)
+_change_state = {"revision": int(time.time() * 1000)}
+_change_state["floor"] = _change_state["revision"]  # Oldest servable cursor
+_entity_digests = {}  # store -> {entity key: digest}
+
+
+def store_entities(store, data):
+    """Entities of a store by key, as reported in the change feed"""
+    if store == "calendar_config":
+        entities = {
+            "settings": calendar_settings(data),
+            "quotes": data.get("quotes", []),
+        }
+        for month in range(1, 13):
+            entities[f"month-{month}"] = calendar_month(data, month)
+        return entities
+    if isinstance(data, list):
+        entities = {str(item.get("id", index)): item for index, item in enumerate(data)}
+        entities["#order"] = list(entities)
+        return entities
+    return dict(data)
+
+
+def entity_digests(store):
+    """Digest of every entity of a store's current in-memory copy
+
+    Taken under _change_lock and committed under the same hold: listeners
+    of two swaps of one store may run in either order, but each sees the
+    copy swapped in last, so older digests never overwrite newer ones.
+    The store must already be loaded.
+    """
+    entities = store_entities(store, _stores[store]["data"])
+    return {key: content_version(value) for key, value in entities.items()}
+
+
+def prime_change_feed():
+    """Take the entity digests that the first changes are compared with"""
+    for store in get_store_specs():
+        get_store(store)  # Loaded before taking the lock
+        with _change_lock:
+            if store not in _entity_digests:
+                _entity_digests[store] = entity_digests(store)
+
+
+@on_store_change
+def record_change(store):
+    """Store change listener: log the change under the next revision"""
+    with _change_lock:
+        digests = entity_digests(store)
+        previous = _entity_digests.get(store)
+        if previous is None:
+            keys = None  # Nothing to compare with, the whole store counts
+        else:
+            keys = {
+                key
+                for key in digests.keys() | previous.keys()
+                if digests.get(key) != previous.get(key)
+            }
+            if not keys:
+                return  # Rewritten with the same content
+        _entity_digests[store] = digests
+        _change_state["revision"] += 1
+        if len(_change_log) == CHANGE_LOG_SIZE:
+            _change_state["floor"] = _change_log[0][0]
+        _change_log.append((_change_state["revision"], store, keys))
+
+
+def current_revision():
+    """Revision of the latest store change"""
+    return _change_state["revision"]
+
+
+def latest_change(store):
+    """(revision, sorted changed keys or None) of the store's latest change"""
+    with _change_lock:
+        for revision, logged_store, keys in reversed(_change_log):
+            if logged_store == store:
+                return revision, None if keys is None else sorted(keys)
+        return _change_state["revision"], None
+
+
+# Registered after record_change, so the revision it took is broadcast
+on_store_change(broadcast_store_change)
+
+
+def changes_since(since):
+    """The current revision, and changed and removed entities per store
+
+    The changes are None when since is unknown to this node (older than the
+    retained log, from before a restart, or from another node).
+    """
+    with _change_lock:
+        revision = _change_state["revision"]
+        if not _change_state["floor"] <= since <= revision:
+            return revision, None
+        touched = {}
+        for logged, store, keys in reversed(_change_log):
+            if logged <= since:
+                break
+            if keys is None or touched.get(store, set()) is None:
+                touched[store] = None
+            else:
+                touched.setdefault(store, set()).update(keys)
+        changes = {}
+        for store, keys in touched.items():
+            change = {"version": store_version(store), "changed": None, "removed": []}
+            if keys is not None:
+                present = _entity_digests.get(store, {})
+                change["changed"] = sorted(key for key in keys if key in present)
+                change["removed"] = sorted(key for key in keys if key not in present)
+            changes[store] = change
+        return revision, changes
+
+
+def read_services_file():
+    """Read services from JSON file"""
+    if not os.path.exists(CONFIG_FILE):
+        return list(DEFAULT_SERVICES)
+
+    return normalize_services(read_json_file("services", CONFIG_FILE, {}))
+
+
+def normalize_services(data):
+    """Services of a services file, with the properties older files lack"""
+    services = []
+    for i, service in enumerate(data.get("services", [])):
+        if "id" not in service:
+            # Stable key for files written before services had IDs;
+            # persisted by the next save
+            service["id"] = f"legacy-{i}"
+        if "column" not in service:
+            service["column"] = 0
+        if "type" not in service:
+            service["type"] = "url"
+        if "description" not in service:
+            service["description"] = ""
+        services.append(service)
+    return services
+
+
+_services_lock = threading.RLock()  # Serializes read-modify-write of the services file
+
+
+def load_services():
+    """Load a private copy of the services"""
+    return copy.deepcopy(get_store("services"))
+
+
+def backup_services_file():
+    """Keep a timestamped copy of the services file, and only the last 5
+
+    The copy is a hard link where possible, and the services file itself
+    stays in place until the atomic rewrite replaces it, so it is never
+    missing in between.
+    """
+    if not os.path.exists(CONFIG_FILE):
+        return
+    backup_file = f"{CONFIG_FILE}.backup.{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+    try:
+        os.link(CONFIG_FILE, backup_file)
+    except OSError:  # No hard links on this filesystem
+        shutil.copy2(CONFIG_FILE, backup_file)
+
+    # Keep only last 5 backups
+    backup_files = sorted(
+        [f for f in os.listdir(".") if f.startswith(f"{CONFIG_FILE}.backup.")]
+    )
+    for backup in backup_files[:-5]:
+        try:
+            os.remove(backup)
+        except FileNotFoundError:
+            pass
+    update_store_status("services", backups=len(backup_files[-5:]))
+
+
+def save_services(services):
+    """Save services to JSON file"""
+    try:
+        with _services_lock:
+            backup_services_file()
+
+            # Save new data
+            data = {"services": services, "last_updated": datetime.now().isoformat()}
+
+            write_json_file("services", CONFIG_FILE, data)
+            reload_store("services")
+        return True
+    except Exception:
+        logger.exception("Error saving services")
+        return False
+
+
+def read_calendar_config_file():
+    """Read calendar configuration from JSON file"""
+    if not os.path.exists(CALENDAR_CONFIG_FILE):
+        logger.warning(
+            "Calendar config file not found. Please ensure %s exists.",
+            CALENDAR_CONFIG_FILE,
+        )
         return {"months": {}, "quotes": [], "siteTitle": "BCOS"}
+    return read_json_file(
+        "calendar_config",
+        CALENDAR_CONFIG_FILE,
+        {"months": {}, "quotes": [], "siteTitle": "BCOS"},
+    )
+
+
+def load_calendar_config():
+    """Load a private copy of the calendar configuration"""
+    return copy.deepcopy(get_store("calendar_config"))
 
 
 def save_calendar_config(config):
     """Save calendar configuration to JSON file"""
     try:
-        with open(CALENDAR_CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        write_json_file("calendar_config", CALENDAR_CONFIG_FILE, config)
+        reload_store("calendar_config")
         return True
-    except Exception as e:
-        print(f"Error saving calendar config: {e}")
+    except Exception:
+        logger.exception("Error saving calendar config")
         return False
 
 
 def load_quotes():
-    """Load quotes from calendar config"""
+    """Load quotes from calendar config (shared, read only)"""
     try:
-        calendar_config = load_calendar_config()
-        return calendar_config.get("quotes", [])
-    except Exception as e:
-        print(f"Error loading quotes: {e}")
+        return get_store("calendar_config").get("quotes", [])
+    except Exception:
+        logger.exception("Error loading quotes")
         return []
 
 
-def load_suggestions():
-    """Load suggestions from JSON file"""
-    try:
-        if os.path.exists(SUGGESTIONS_FILE):
-            with open(SUGGESTIONS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        else:
-            return []
-    except Exception as e:
-        print(f"Error loading suggestions: {e}")
+# The calendar configuration is also served as separate resources: the
+# site settings, one resource per month and the quotes collection, so a
+# panel only downloads the month it shows. Each resource is versioned by
+# its content, so editing one month leaves the others' versions (and the
+# client caches keyed by them) alone.
+CALENDAR_SETTINGS_FIELDS = ("format", "monthNames", "siteTitle")
+QUOTES_PAGE_SIZE = 50
+MAX_QUOTES_PAGE_SIZE = 500
+_calendar_lock = threading.Lock()  # Serializes read-modify-write of the calendar file
+_calendar_versions = {"data": None, "versions": {}}
+
+
+def content_version(data):
+    """Short digest of JSON data, stable across key order"""
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def calendar_settings(config):
+    """Site settings part of the calendar configuration"""
+    return {
+        field: config[field] for field in CALENDAR_SETTINGS_FIELDS if field in config
+    }
+
+
+def calendar_month(config, month):
+    """One month of the calendar configuration"""
+    return config.get("months", {}).get(str(month), {"name": "", "phrases": []})
+
+
+def calendar_resource_versions():
+    """Versions of the calendar resources, worked out once per loaded config"""
+    global _calendar_versions
+    config = get_store("calendar_config")
+    cached = _calendar_versions
+    if cached["data"] is config:
+        return cached["versions"]
+    versions = {
+        "settings": content_version(calendar_settings(config)),
+        "quotes": content_version(config.get("quotes", [])),
+    }
+    for month in range(1, 13):
+        versions[f"month-{month}"] = content_version(calendar_month(config, month))
+    # One assignment, so readers never see data and versions out of step
+    _calendar_versions = {"data": config, "versions": versions}
+    return versions
+
+
+def update_calendar_resource(resource, base_version, change):
+    """Apply change(config) to the calendar configuration and save it
+
+    A base_version that no longer matches the resource is a 409 conflict.
+    change edits a private copy in place and may return a response to
+    abort. The whole configuration is validated again before saving.
+    """
+    with _calendar_lock:
+        current = calendar_resource_versions()[resource]
+        if base_version is not None and base_version != current:
+            return jsonify(
+                {
+                    "success": False,
+                    "error": "Changed elsewhere, reload and try again",
+                    "conflict": True,
+                    "version": current,
+                }
+            ), 409
+
+        config = load_calendar_config()
+        aborted = change(config)
+        if aborted is not None:
+            return aborted
+        errors = []
+        config = validate_calendar_config(config, ("config",), errors)
+        if errors:
+            return validation_error_response(errors[:MAX_VALIDATION_ERRORS])
+        if not save_calendar_config(config):
+            return jsonify(
+                {"success": False, "error": "Failed to save calendar configuration"}
+            ), 500
+        return jsonify(
+            {"success": True, "version": calendar_resource_versions()[resource]}
+        )
+
+
+def read_suggestions_file():
+    """Read suggestions from JSON file"""
+    if not os.path.exists(SUGGESTIONS_FILE):
         return []
+    return read_json_file("suggestions", SUGGESTIONS_FILE, [])
+
+
+_suggestions_lock = threading.Lock()  # Serializes suggestions read-modify-write
+
+
+def load_suggestions():
+    """Load a private copy of the suggestions"""
+    return copy.deepcopy(get_store("suggestions"))
 
 
 def save_suggestions(suggestions):
     """Save suggestions to JSON file"""
     try:
-        with open(SUGGESTIONS_FILE, "w", encoding="utf-8") as f:
-            json.dump(suggestions, f, indent=2, ensure_ascii=False)
+        write_json_file("suggestions", SUGGESTIONS_FILE, suggestions)
+        reload_store("suggestions")
         return True
-    except Exception as e:
-        print(f"Error saving suggestions: {e}")
+    except Exception:
+        logger.exception("Error saving suggestions")
+        return False
+
+
+# Notes live in their own store keyed by service id, so editing a note
+# doesn't rewrite (and back up) every service
+_notes_lock = threading.Lock()  # Serializes read-modify-write of the notes file
+
+
+def read_notes_file():
+    """Read notes from JSON file"""
+    if not os.path.exists(NOTES_FILE):
+        return {}
+    return read_json_file("notes", NOTES_FILE, {}).get("notes", {})
+
+
+def load_notes():
+    """Load a private copy of the notes"""
+    return copy.deepcopy(get_store("notes"))
+
+
+def save_notes(notes):
+    """Save notes to JSON file"""
+    try:
+        data = {"notes": notes, "last_updated": datetime.now().isoformat()}
+        write_json_file("notes", NOTES_FILE, data)
+        reload_store("notes")
+        return True
+    except Exception:
+        logger.exception("Error saving notes")
         return False
 
 
+def set_note(notes, service_id, content):
+    """Store note content, bumping its version; False if nothing changed"""
+    note = notes.get(service_id)
+    if note is not None and note["content"] == content:
+        return False
+    notes[service_id] = {
+        "content": content,
+        "version": (note["version"] if note else 0) + 1,
+        "updated": datetime.now().isoformat(),
+    }
+    return True
+
+
+def apply_note_edits(content, edits):
+    """Apply splice edits, all relative to the same base text, to content"""
+    end_of_previous = len(content)
+    for edit in sorted(edits, key=lambda edit: edit["start"], reverse=True):
+        start, end = edit["start"], edit["end"]
+        if not start <= end <= end_of_previous:
+            raise ValueError("Note edits must not overlap or run past the end")
+        content = content[:start] + edit["text"] + content[end:]
+        end_of_previous = start
+    return content
+
+
+def sync_notes(services):
+    """Move notes_content out of services into the notes store
+
+    Notes of services that are gone (or no longer notes cards) are dropped.
+    """
+    with _notes_lock:
+        notes = load_notes()
+        changed = False
+        for service in services:
+            if "notes_content" in service:
+                content = service.pop("notes_content")
+                changed |= set_note(notes, service["id"], content)
+
+        live = {s["id"] for s in services if s.get("type") == "notes"}
+        for service_id in [i for i in notes if i not in live]:
+            del notes[service_id]
+            changed = True
+
+        return save_notes(notes) if changed else True
+
+
+def migrate_legacy_notes():
+    """Move notes still stored inside the services file to the notes store"""
+    if not os.path.exists(CONFIG_FILE):
+        return
+    services = load_services()
+    if any("notes_content" in service for service in services) and sync_notes(services):
+        save_services(services)
+        logger.info("Moved notes out of %s into %s", CONFIG_FILE, NOTES_FILE)
+
+
+# Validation
+MAX_SERVICES_BODY_BYTES = 2 * 1024 * 1024
+MAX_CALENDAR_BODY_BYTES = 512 * 1024
+MAX_SERVICES = 1000
+MAX_VALIDATION_ERRORS = 50
+TIME_PATTERN = r"^(?:([01]\d|2[0-3]):[0-5]\d)?$"  # HH:MM, or empty for "any time"
+SERVICE_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+MAX_NOTES_BODY_BYTES = 512 * 1024
+MAX_NOTE_LENGTH = 100000
+MAX_NOTE_EDITS = 100
+
+
+class RequestBodyError(Exception):
+    """A request body that is too large or not valid JSON"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def read_json_body(max_bytes):
+    """Parse the JSON request body, refusing bodies larger than max_bytes"""
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise RequestBodyError(f"Request body exceeds {max_bytes} bytes", 413)
+    raw = request.stream.read(max_bytes + 1)
+    if len(raw) > max_bytes:
+        raise RequestBodyError(f"Request body exceeds {max_bytes} bytes", 413)
+    try:
+        return json.loads(raw)
+    except ValueError:
+        raise RequestBodyError("Request body is not valid JSON")
+
+
+def _format_path(path):
+    """Render a validation path such as ("Service 3", "services", 0, "url")
+
+    An empty path is the request body itself.
+    """
+    if not path:
+        return "body: "
+    label, rest = path[0], ""
+    for part in path[1:]:
+        rest += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return f"{label}: {rest.lstrip('.')} " if rest else f"{label}: "
+
+
+def compile_schema(schema):
+    """Compile a schema dict into a validator(value, path, errors) function
+
+    Supported keys: type (string, integer, object or array), one_of, enum,
+    strip, min_length, max_length, pattern, coerce, minimum, maximum, clamp,
+    properties, required, default, keys, values, items, min_items, max_items
+    and check (a callable run once the value is structurally valid).
+    Validators append messages to errors and return the normalized value.
+    """
+    kind = schema.get("type")
+    check = schema.get("check")
+
+    if "one_of" in schema:
+        options = [compile_schema(option) for option in schema["one_of"]]
+        message = schema.get("message", "has an invalid format")
+
+        def validate(value, path, errors):
+            for option in options:
+                option_errors = []
+                result = option(value, path, option_errors)
+                if not option_errors:
+                    return result
+            errors.append(_format_path(path) + message)
+            return value
+
+        return validate
+
+    if kind == "string":
+        strip = schema.get("strip", False)
+        min_length = schema.get("min_length", 0)
+        max_length = schema.get("max_length")
+        pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+        enum = frozenset(schema["enum"]) if "enum" in schema else None
+
+        def validate(value, path, errors):
+            if not isinstance(value, str):
+                errors.append(_format_path(path) + "must be a string")
+                return value
+            if strip:
+                value = value.strip()
+            if len(value) < min_length:
+                errors.append(
+                    _format_path(path)
+                    + ("is required" if min_length == 1 else "is too short")
+                )
+            elif max_length is not None and len(value) > max_length:
+                errors.append(
+                    _format_path(path) + f"must be at most {max_length} characters"
+                )
+            elif pattern is not None and not pattern.match(value):
+                errors.append(_format_path(path) + "has an invalid format")
+            elif enum is not None and value not in enum:
+                errors.append(_format_path(path) + f"must be one of {sorted(enum)}")
+            return value
+
+    elif kind == "integer":
+        coerce = schema.get("coerce", False)
+        minimum = schema.get("minimum")
+        maximum = schema.get("maximum")
+        clamp = schema.get("clamp", False)
+
+        def validate(value, path, errors):
+            if (
+                coerce
+                and isinstance(value, (str, float))
+                and not isinstance(value, bool)
+            ):
+                try:
+                    value = int(value)
+                except ValueError:
+                    pass
+            if not isinstance(value, int) or isinstance(value, bool):
+                errors.append(_format_path(path) + "must be an integer")
+                return value
+            if clamp:
+                return max(minimum, min(maximum, value))
+            if (minimum is not None and value < minimum) or (
+                maximum is not None and value > maximum
+            ):
+                errors.append(
+                    _format_path(path) + f"must be between {minimum} and {maximum}"
+                )
+            return value
+
+    elif kind == "object":
+        properties = {
+            name: (compile_schema(prop), prop)
+            for name, prop in schema.get("properties", {}).items()
+        }
+        required = tuple(schema.get("required", ()))
+        allowed_keys = frozenset(schema["keys"]) if "keys" in schema else None
+        values = compile_schema(schema["values"]) if "values" in schema else None
+
+        def validate(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append(_format_path(path) + "must be an object")
+                return value
+            for name in required:
+                if name not in value:
+                    errors.append(_format_path(path + (name,)) + "is required")
+            for name, (validator, prop) in properties.items():
+                if name in value:
+                    value[name] = validator(value[name], path + (name,), errors)
+                elif "default" in prop:
+                    value[name] = prop["default"]
+            if allowed_keys is not None or values is not None:
+                for key in list(value):
+                    if allowed_keys is not None and key not in allowed_keys:
+                        errors.append(_format_path(path + (key,)) + "is not allowed")
+                    elif values is not None:
+                        value[key] = values(value[key], path + (key,), errors)
+            return value
+
+    elif kind == "array":
+        items = compile_schema(schema["items"]) if "items" in schema else None
+        min_items = schema.get("min_items", 0)
+        max_items = schema.get("max_items")
+
+        def validate(value, path, errors):
+            if not isinstance(value, list):
+                errors.append(_format_path(path) + "must be a list")
+                return value
+            if len(value) < min_items:
+                errors.append(_format_path(path) + f"needs at least {min_items} items")
+            if max_items is not None and len(value) > max_items:
+                errors.append(_format_path(path) + f"allows at most {max_items} items")
+                return value
+            if items is not None:
+                for i, item in enumerate(value):
+                    value[i] = items(item, path + (i,), errors)
+            return value
+
+    else:
+        raise ValueError(f"Unknown schema type: {kind!r}")
+
+    if check is None:
+        return validate
+
+    def validate_and_check(value, path, errors):
+        error_count = len(errors)
+        value = validate(value, path, errors)
+        if len(errors) == error_count:
+            check(value, path, errors)
+        return value
+
+    return validate_and_check
+
+
+def _time_ranges_overlap(a_start, a_end, b_start, b_end):
+    """Whether two HH:MM minute ranges overlap; start > end wraps past midnight"""
+
+    def covers(start, end, minute):
+        if start == end:
+            return False
+        if start < end:
+            return start <= minute < end
+        return minute >= start or minute < end
+
+    for point in (b_start, b_end - 1 if b_end > 0 else 1439):
+        if covers(a_start, a_end, point):
+            return True
+    for point in (a_start, a_end - 1 if a_end > 0 else 1439):
+        if covers(b_start, b_end, point):
+            return True
+    return False
+
+
+def _check_phrase_overlaps(phrases, path, errors):
+    """Reject scheduled phrases of one month whose time ranges overlap"""
+
+    def minutes(hhmm):
+        hours, mins = hhmm.split(":")
+        return int(hours) * 60 + int(mins)
+
+    scheduled = [
+        (i, phrase, minutes(phrase["startTime"]), minutes(phrase["endTime"]))
+        for i, phrase in enumerate(phrases)
+        if isinstance(phrase, dict)
+        and phrase.get("startTime")
+        and phrase.get("endTime")
+    ]
+    for n, (i, a, a_start, a_end) in enumerate(scheduled):
+        for j, b, b_start, b_end in scheduled[n + 1 :]:
+            if _time_ranges_overlap(a_start, a_end, b_start, b_end):
+                errors.append(
+                    _format_path(path + (j,))
+                    + f'"{b["text"]}" ({b["startTime"]}-{b["endTime"]}) overlaps '
+                    f'with "{a["text"]}" ({a["startTime"]}-{a["endTime"]})'
+                )
+
+
+def _service_schema(required=(), **properties):
+    """Schema of one service type: the common fields plus type-specific ones"""
+    common = {
+        "id": {"type": "string", "pattern": SERVICE_ID_PATTERN},
+        "type": {"type": "string"},
+        "name": {"type": "string", "strip": True, "max_length": 200},
+        "description": {"type": "string", "max_length": 1000, "default": ""},
+        "icon": {"type": "string", "max_length": 100},
+        "column": {
+            "type": "integer",
+            "coerce": True,
+            "clamp": True,
+            "minimum": 0,
+            "maximum": 2,
+            "default": 0,
+        },
+    }
+    for name in required:
+        properties.setdefault(name, dict(common.get(name, {"type": "string"})))
+        if properties[name]["type"] == "string":
+            properties[name]["strip"] = True
+            properties[name]["min_length"] = 1
+    return compile_schema(
+        {
+            "type": "object",
+            "properties": {**common, **properties},
+            "required": ("type",) + tuple(required),
+        }
+    )
+
+
+URL_FIELD = {"type": "string", "max_length": 2048}
+
+SERVICE_SCHEMAS = {
+    "url": _service_schema(("name", "url"), url=dict(URL_FIELD)),
+    "url-group": _service_schema(
+        ("services",),
+        services={
+            "type": "array",
+            "min_items": 1,
+            "max_items": 50,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "strip": True, "min_length": 1},
+                    "url": dict(URL_FIELD, strip=True, min_length=1),
+                    "icon": {"type": "string", "max_length": 100},
+                },
+                "required": ("name", "url"),
+            },
+        },
+    ),
+    "search": _service_schema(("name", "search_url"), search_url=dict(URL_FIELD)),
+    "iframe": _service_schema(
+        ("name", "iframe_url"),
+        iframe_url=dict(URL_FIELD),
+        iframe_width={"type": "string", "max_length": 20},
+        iframe_height={"type": "string", "max_length": 20},
+    ),
+    "notes": _service_schema(
+        ("name",), notes_content={"type": "string", "max_length": MAX_NOTE_LENGTH}
+    ),
+    "quote": _service_schema(("name",)),
+    "calendar": _service_schema(("name",)),
+    "clipboard": _service_schema(("name",), clipboard_server_url=dict(URL_FIELD)),
+    "fileshare": _service_schema(
+        ("name",),
+        fileshare_server_url=dict(URL_FIELD),
+        fileshare_max_files={
+            "type": "integer",
+            "coerce": True,
+            "minimum": 1,
+            "maximum": 100,
+        },
+    ),
+    "suggestions": _service_schema(("name",)),
+    "feed": _service_schema(
+        ("name", "feed_url"),
+        feed_url=dict(URL_FIELD, pattern=r"^https?://"),
+        feed_interval={
+            "type": "integer",
+            "coerce": True,
+            "clamp": True,
+            "minimum": 60,
+            "maximum": 86400,
+            "default": 900,
+        },
+        feed_max_items={
+            "type": "integer",
+            "coerce": True,
+            "clamp": True,
+            "minimum": 1,
+            "maximum": 50,
+            "default": 5,
+        },
+    ),
+}
+
+PHRASE_SCHEMA = {
+    "one_of": [
+        {"type": "string", "max_length": 200},
+        {
+            "type": "object",
+            "properties": {
+                "text": {"type": "string", "strip": True, "min_length": 1},
+                "startTime": {"type": "string", "pattern": TIME_PATTERN},
+                "endTime": {"type": "string", "pattern": TIME_PATTERN},
+            },
+            "required": ("text",),
+        },
+    ],
+    "message": "must be a string or a {text, startTime, endTime} object "
+    "with HH:MM times",
+}
+
+CALENDAR_SETTINGS_PROPERTIES = {
+    "format": {"type": "string", "max_length": 200},
+    "siteTitle": {"type": "string", "strip": True, "max_length": 100},
+    "monthNames": {
+        "type": "array",
+        "min_items": 12,
+        "max_items": 12,
+        "items": {"type": "string", "strip": True, "min_length": 1},
+    },
+}
+
+MONTH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "max_length": 100},
+        "phrases": {
+            "type": "array",
+            "max_items": 100,
+            "items": PHRASE_SCHEMA,
+            "check": _check_phrase_overlaps,
+        },
+    },
+}
+
+QUOTE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "text": {"type": "string", "strip": True, "min_length": 1, "max_length": 5000},
+        "author": {"type": "string", "strip": True, "max_length": 200},
+    },
+    "required": ("text",),
+}
+
+QUOTES_SCHEMA = {"type": "array", "max_items": 10000, "items": QUOTE_SCHEMA}
+
+validate_calendar_config = compile_schema(
+    {
+        "type": "object",
+        "properties": {
+            **CALENDAR_SETTINGS_PROPERTIES,
+            "months": {
+                "type": "object",
+                "keys": [str(month) for month in range(1, 13)],
+                "values": MONTH_SCHEMA,
+            },
+            "quotes": QUOTES_SCHEMA,
+        },
+    }
+)
+
+# Partial updates of the calendar resources; base_version is the version
+# the change was made against
+BASE_VERSION_FIELD = {"type": "string", "max_length": 64}
+
+validate_settings_patch = compile_schema(
+    {
+        "type": "object",
+        "keys": (*CALENDAR_SETTINGS_PROPERTIES, "base_version"),
+        "properties": {
+            **CALENDAR_SETTINGS_PROPERTIES,
+            "base_version": BASE_VERSION_FIELD,
+        },
+    }
+)
+
+validate_month_patch = compile_schema(
+    {
+        "type": "object",
+        "keys": ("name", "phrases", "base_version"),
+        "properties": {
+            **MONTH_SCHEMA["properties"],
+            "base_version": BASE_VERSION_FIELD,
+        },
+    }
+)
+
+validate_new_quote = compile_schema(dict(QUOTE_SCHEMA, keys=("text", "author")))
+
+validate_quote_patch = compile_schema(
+    {
+        "type": "object",
+        "keys": ("text", "author", "base_version"),
+        "properties": {
+            **QUOTE_SCHEMA["properties"],
+            "base_version": BASE_VERSION_FIELD,
+        },
+    }
+)
+
+validate_quotes_replace = compile_schema(
+    {
+        "type": "object",
+        "keys": ("quotes", "base_version"),
+        "required": ("quotes",),
+        "properties": {"quotes": QUOTES_SCHEMA, "base_version": BASE_VERSION_FIELD},
+    }
+)
+
+validate_note_patch = compile_schema(
+    {
+        "type": "object",
+        "keys": ("base_version", "content", "edits"),
+        "required": ("base_version",),
+        "properties": {
+            "base_version": {"type": "integer", "minimum": 0},
+            "content": {"type": "string", "max_length": MAX_NOTE_LENGTH},
+            "edits": {
+                "type": "array",
+                "max_items": MAX_NOTE_EDITS,
+                "items": {
+                    "type": "object",
+                    "keys": ("start", "end", "text"),
+                    "required": ("start", "end", "text"),
+                    "properties": {
+                        "start": {"type": "integer", "minimum": 0},
+                        "end": {"type": "integer", "minimum": 0},
+                        "text": {"type": "string", "max_length": MAX_NOTE_LENGTH},
+                    },
+                },
+            },
+        },
+    }
+)
+
+
+def new_service_id():
+    """Random stable key for a service"""
+    return uuid.uuid4().hex[:12]
+
+
+def service_validator(service, path, errors):
+    """The validator for the service's type, or None once the error is recorded"""
+    if not isinstance(service, dict):
+        errors.append(_format_path(path) + "must be an object")
+        return None
+    service_type = service.get("type", "url")
+    if not isinstance(service_type, str) or service_type not in SERVICE_SCHEMAS:
+        errors.append(
+            _format_path(path + ("type",)) + f"must be one of {sorted(SERVICE_SCHEMAS)}"
+        )
+        return None
+    return SERVICE_SCHEMAS[service_type]
+
+
+def validate_services(services):
+    """Validate and normalize a services list in one pass, collecting all errors
+
+    Services without an id get a new one; duplicate ids are rejected.
+    """
+    errors = []
+    seen_ids = set()
+    if not isinstance(services, list):
+        return ["services: must be a list"]
+    if len(services) > MAX_SERVICES:
+        return [f"services: allows at most {MAX_SERVICES} items"]
+    for i, service in enumerate(services):
+        path = (f"Service {i + 1}",)
+        validator = service_validator(service, path, errors)
+        if validator is None:
+            continue
+        service.setdefault("type", "url")
+        services[i] = validator(service, path, errors)
+        service_id = service.setdefault("id", new_service_id())
+        if service_id in seen_ids:
+            errors.append(_format_path(path + ("id",)) + "must be unique")
+        seen_ids.add(service_id)
+        if len(errors) >= MAX_VALIDATION_ERRORS:
+            break
+    return errors[:MAX_VALIDATION_ERRORS]
+
+
+def check_services_store(services):
+    """Validation errors of services read from disk, leaving them untouched"""
+    return validate_services(copy.deepcopy(services))
+
+
+def check_calendar_config_store(config):
+    """Validation errors of a calendar config read from disk"""
+    errors = []
+    validate_calendar_config(copy.deepcopy(config), ("config",), errors)
+    return errors[:MAX_VALIDATION_ERRORS]
+
+
+def _check_profile_names(profiles, path, errors):
+    for name in profiles:
+        if not re.match(SERVICE_ID_PATTERN, name):
+            errors.append(
+                _format_path(path + (name,))
+                + "is not a valid name (use letters, digits, - and _)"
+            )
+
+
+PROFILE_ID_LIST = {
+    "type": "array",
+    "max_items": MAX_SERVICES,
+    "items": {"type": "string", "pattern": SERVICE_ID_PATTERN},
+}
+VISIBILITY_PROFILE_SCHEMA = {
+    "type": "object",
+    "keys": ("show", "hide"),
+    "properties": {"show": PROFILE_ID_LIST, "hide": PROFILE_ID_LIST},
+}
+validate_visibility_profile = compile_schema(VISIBILITY_PROFILE_SCHEMA)
+validate_visibility_profiles = compile_schema(
+    {
+        "type": "object",
+        "values": VISIBILITY_PROFILE_SCHEMA,
+        "check": _check_profile_names,
+    }
+)
+
+
+def check_visibility_profiles_store(profiles):
+    """Validation errors of visibility profiles read from disk"""
+    errors = []
+    validate_visibility_profiles(copy.deepcopy(profiles), ("profiles",), errors)
+    return errors[:MAX_VALIDATION_ERRORS]
+
+
+def validation_error_response(errors):
+    """400 response listing every validation error"""
+    summary = errors[0] if len(errors) == 1 else f"{len(errors)} validation errors"
+    return jsonify({"success": False, "error": summary, "errors": errors}), 400
+
+
+def versioned_response(payload, etag):
+    """JSON response tagged with a version, or 304 when the client has it
+
+    payload may be a callable, so it is only built when actually sent.
+    """
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(payload() if callable(payload) else payload)
+    response.set_etag(etag)
+    # Caches may keep the body but must revalidate before reusing it
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+# Sessions
+#
+# By default the session lives in Flask's signed cookie. With SESSION_STORE
+# set to "memory" (one worker) or "sqlite" (workers sharing SESSION_DB), the
+# cookie only carries a short opaque token and the data stays on the server.
+# Either way, static files never load or save the session.
+SESSION_STORE = "cookie"  # "cookie", "memory" or "sqlite"
+SESSION_DB = "sessions.sqlite3"
+SESSION_TTL = 7 * 24 * 3600  # Seconds an idle session is kept
+SESSION_TOKEN_BYTES = 16  # 22 characters in the cookie
+SESSION_TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{22}$")
+SESSION_SWEEP_INTERVAL = 300  # Seconds between purges of expired sessions
+SESSIONLESS_PATHS = ("/static/", "/favicon.", "/sw.js")
+
+
+class ServerSideSession(SecureCookieSession):
+    """Session data kept on the server, found by the token in the cookie"""
+
+    def __init__(self, initial=None, token=None, expires=0.0):
+        super().__init__(initial)
+        self.token = token
+        self.expires = expires
+        self.loaded_as_admin = bool(self.get("admin_authenticated"))
+
+
+class MemorySessionBackend:
+    """Sessions in this process's memory, dropped after ttl seconds idle"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._sessions = {}  # token -> (expires, data)
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def load(self, token):
+        """(data, expires) of a live session, or None"""
+        with self._lock:
+            entry = self._sessions.get(token)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return dict(entry[1]), entry[0]
+
+    def save(self, token, data):
+        now = time.time()
+        with self._lock:
+            self._sessions[token] = (now + self.ttl, dict(data))
+            if now >= self._next_sweep:
+                self._next_sweep = now + SESSION_SWEEP_INTERVAL
+                for key, (expires, _) in list(self._sessions.items()):
+                    if expires <= now:
+                        del self._sessions[key]
+
+    def touch(self, token):
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is not None:
+                self._sessions[token] = (time.time() + self.ttl, entry[1])
+
+    def delete(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+
+class SqliteSessionBackend:
+    """Sessions in a SQLite file, shared by every worker that opens it"""
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._pool = queue.LifoQueue()
+        self._next_sweep = 0.0
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "token TEXT PRIMARY KEY, expires REAL NOT NULL, data TEXT NOT NULL)"
+            )
+
+    @contextmanager
+    def _connection(self):
+        """A pooled connection; request threads come and go, connections stay"""
+        import sqlite3
+
+        try:
+            db = self._pool.get_nowait()
+        except queue.Empty:
+            db = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield db
+        finally:
+            self._pool.put(db)
+
+    def load(self, token):
+        """(data, expires) of a live session, or None"""
+        with self._connection() as db:
+            row = db.execute(
+                "SELECT data, expires FROM sessions WHERE token = ? AND expires > ?",
+                (token, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def save(self, token, data):
+        now = time.time()
+        with self._connection() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO sessions (token, expires, data) VALUES (?, ?, ?)",
+                (token, now + self.ttl, json.dumps(data, separators=(",", ":"))),
+            )
+            if now >= self._next_sweep:
+                self._next_sweep = now + SESSION_SWEEP_INTERVAL
+                db.execute("DELETE FROM sessions WHERE expires <= ?", (now,))
+
+    def touch(self, token):
+        with self._connection() as db:
+            db.execute(
+                "UPDATE sessions SET expires = ? WHERE token = ?",
+                (time.time() + self.ttl, token),
+            )
+
+    def delete(self, token):
+        with self._connection() as db:
+            db.execute("DELETE FROM sessions WHERE token = ?", (token,))
+
+
+class CookieSessionInterface(SecureCookieSessionInterface):
+    """Flask's signed cookie session, skipped for static files"""
+
+    def open_session(self, app, request):
+        if request.path.startswith(SESSIONLESS_PATHS):
+            return None  # Flask substitutes a null session and never saves it
+        return super().open_session(app, request)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Session kept in a backend, with only an opaque token in the cookie"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def open_session(self, app, request):
+        if request.path.startswith(SESSIONLESS_PATHS):
+            return None
+        token = request.cookies.get(self.get_cookie_name(app))
+        if token and SESSION_TOKEN_PATTERN.match(token):
+            entry = self.backend.load(token)
+            observe_cache_lookup("session", entry is not None)
+            if entry is not None:
+                return ServerSideSession(entry[0], token, entry[1])
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified and session.token:
+                self.backend.delete(session.token)
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add("Cookie")
+            return
+
+        if not session.modified:
+            # Sliding expiry, written at most once per half TTL
+            if session.expires - time.time() < self.backend.ttl / 2:
+                self.backend.touch(session.token)
+            return
+
+        # A new token when privileges change (admin login or logout), so a
+        # token seen before login is worthless after it. Other changes keep
+        # the token, so parallel requests still carrying it see the update.
+        token = session.token
+        if not token or session.loaded_as_admin != bool(
+            session.get("admin_authenticated")
+        ):
+            if token:
+                self.backend.delete(token)
+            token = secrets.token_urlsafe(SESSION_TOKEN_BYTES)
+        self.backend.save(token, dict(session))
+        response.set_cookie(
+            name,
+            token,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+            partitioned=self.get_cookie_partitioned(app),
+        )
+        response.vary.add("Cookie")
+
+
+def configure_sessions(store=SESSION_STORE, db_path=SESSION_DB):
+    """Keep sessions in the signed cookie, in memory or in a SQLite file"""
+    if store == "memory":
+        app.session_interface = ServerSideSessionInterface(
+            MemorySessionBackend(SESSION_TTL)
+        )
+    elif store == "sqlite":
+        app.session_interface = ServerSideSessionInterface(
+            SqliteSessionBackend(db_path, SESSION_TTL)
+        )
+    else:
+        app.session_interface = CookieSessionInterface()
+
+
+configure_sessions()
+
+
 def check_admin_auth():
     """Check if user is authenticated as admin"""
     return session.get("admin_authenticated", False)
@@ -152,14 +2547,27 @@ def check_admin_auth():
 
 @app.route("/")
 def index():
-    return render_template("index.html", admin_mode=False)
+    kiosk_mode = request.args.get("kiosk") == "1"
+    return remember_visibility_profile(
+        make_response(
+            render_template("index.html", admin_mode=False, kiosk_mode=kiosk_mode)
+        )
+    )
+
+
+@app.route("/kiosk")
+def kiosk():
+    """Read-only dashboard for always-on wall displays"""
+    return remember_visibility_profile(
+        make_response(render_template("index.html", admin_mode=False, kiosk_mode=True))
+    )
 
 
 @app.route("/admin")
 def admin():
     if not check_admin_auth():
         return render_template("admin_login.html")
-    return render_template("index.html", admin_mode=True)
+    return render_template("index.html", admin_mode=True, kiosk_mode=False)
 
 
 @app.route("/admin/login", methods=["POST"])
@@ -180,14 +2588,42 @@ def admin_logout():
     return jsonify({"success": True})
 
 
+def services_etag(profile_name=None):
+    """Version tag of the services payload, as seen through a profile"""
+    etag = f"services-{store_version('services')}"
+    if profile_name is not None:
+        etag = f"{etag}-{profile_name}-{store_version('visibility_profiles')}"
+    return etag
+
+
 @app.route("/api/services", methods=["GET"])
 def get_services():
     """Get all services"""
     try:
-        services = load_services()
-        return jsonify({"success": True, "services": services, "count": len(services)})
+        services = get_store("services")
+
+        # Devices with a visibility profile only get the cards they show
+        name = selected_visibility_profile()
+        profile = get_store("visibility_profiles").get(name) if name else None
+        etag = services_etag(name if profile is not None else None)
+
+        def payload():
+            shown = services if profile is None else visible_services(services, profile)
+            result = {
+                "success": True,
+                "services": shown,
+                "count": len(shown),
+                "search_index": get_search_index(shown, etag),
+            }
+            if profile is not None:
+                result["profile"] = name
+            return result
+
+        response = versioned_response(payload, etag)
+        response.vary.add("Cookie")
+        return response
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/services", methods=["POST"])
@@ -197,70 +2633,26 @@ def save_services_endpoint():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
 
     try:
-        data = request.get_json()
+        data = read_json_body(MAX_SERVICES_BODY_BYTES)
+    except RequestBodyError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
 
-        if not data or "services" not in data:
+    try:
+        if not isinstance(data, dict) or "services" not in data:
             return jsonify({"success": False, "error": "Invalid request data"}), 400
 
         services = data["services"]
 
-        # Validate services data
-        for i, service in enumerate(services):
-            required_fields = ["type"]
-            if service.get("type") != "url-group":
-                required_fields.append("name")
-
-            for field in required_fields:
-                if field not in service or not service[field].strip():
-                    return jsonify(
-                        {
-                            "success": False,
-                            "error": f"Service {i + 1}: {field} is required",
-                        }
-                    ), 400
-
-            # Type-specific validation
-            if service["type"] == "url" and not service.get("url", "").strip():
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"Service {i + 1}: URL is required for URL type services",
-                    }
-                ), 400
-            elif (
-                service["type"] == "search"
-                and not service.get("search_url", "").strip()
-            ):
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"Service {i + 1}: Search URL is required for search type services",
-                    }
-                ), 400
-            elif (
-                service["type"] == "iframe"
-                and not service.get("iframe_url", "").strip()
-            ):
-                return jsonify(
-                    {
-                        "success": False,
-                        "error": f"Service {i + 1}: Iframe URL is required for iframe type services",
-                    }
-                ), 400
-
-            # Ensure required properties exist
-            if "column" not in service:
-                service["column"] = 0
-            else:
-                service["column"] = max(0, min(2, int(service["column"])))
+        # Validate and normalize all services before touching the disk
+        errors = validate_services(services)
+        if errors:
+            return validation_error_response(errors)
 
-            if "description" not in service:
-                service["description"] = ""
+        with _services_lock:
+            if not sync_notes(services):
+                return jsonify({"success": False, "error": "Failed to save notes"}), 500
 
-            if "type" not in service:
-                service["type"] = "url"
-
-        success = save_services(services)
+            success = save_services(services)
 
         if success:
             return jsonify(
@@ -274,23 +2666,38 @@ def save_services_endpoint():
             return jsonify({"success": False, "error": "Failed to save services"}), 500
 
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/services/<int:service_id>", methods=["DELETE"])
 def delete_service(service_id):
-    """Delete a specific service - admin only"""
+    """Delete a specific service - admin only
+
+    service_id is the tile's position. Pass ?id=<service id> as well to
+    have the delete refused (409) if another edit moved a different tile
+    into that position.
+    """
     if not check_admin_auth():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
 
     try:
-        services = load_services()
+        with _services_lock:
+            services = load_services()
 
-        if service_id < 0 or service_id >= len(services):
-            return jsonify({"success": False, "error": "Service not found"}), 404
+            if service_id < 0 or service_id >= len(services):
+                return jsonify({"success": False, "error": "Service not found"}), 404
 
-        deleted_service = services.pop(service_id)
-        success = save_services(services)
+            expected_id = request.args.get("id")
+            if (
+                expected_id is not None
+                and str(services[service_id]["id"]) != expected_id
+            ):
+                return jsonify(
+                    {"success": False, "error": "The tiles changed, reload and retry"}
+                ), 409
+
+            deleted_service = services.pop(service_id)
+            success = save_services(services) and sync_notes(services)
 
         if success:
             return jsonify(
@@ -303,7 +2710,85 @@ def delete_service(service_id):
             return jsonify({"success": False, "error": "Failed to delete service"}), 500
 
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
+
+
+@app.route("/api/notes/<service_id>", methods=["GET"])
+def get_note(service_id):
+    """Get the content of a notes card"""
+    try:
+        note = get_store("notes").get(service_id, {"content": "", "version": 0})
+        return versioned_response(
+            {"success": True, "content": note["content"], "version": note["version"]},
+            f"note-{service_id}-{note['version']}-{note.get('updated', 'new')}",
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/notes/<service_id>", methods=["PATCH"])
+def patch_note(service_id):
+    """Apply a patch to a notes card - admin only
+
+    The patch names the version it was made against and carries either the
+    full content or splice edits; a stale base version is a 409 conflict.
+    """
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+
+    try:
+        data = read_json_body(MAX_NOTES_BODY_BYTES)
+    except RequestBodyError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+
+    errors = []
+    patch = validate_note_patch(data, (), errors)
+    if errors:
+        return validation_error_response(errors[:MAX_VALIDATION_ERRORS])
+
+    try:
+        if not any(
+            s.get("id") == service_id and s.get("type") == "notes"
+            for s in get_store("services")
+        ):
+            return jsonify({"success": False, "error": "Notes card not found"}), 404
+
+        with _notes_lock:
+            notes = load_notes()
+            note = notes.get(service_id, {"content": "", "version": 0})
+            if patch["base_version"] != note["version"]:
+                return jsonify(
+                    {
+                        "success": False,
+                        "error": "Note was changed elsewhere",
+                        "conflict": True,
+                        "content": note["content"],
+                        "version": note["version"],
+                    }
+                ), 409
+
+            if "content" in patch:
+                content = patch["content"]
+            else:
+                try:
+                    content = apply_note_edits(note["content"], patch.get("edits", []))
+                except ValueError as e:
+                    return jsonify({"success": False, "error": str(e)}), 400
+            if len(content) > MAX_NOTE_LENGTH:
+                return jsonify(
+                    {
+                        "success": False,
+                        "error": f"Notes must be at most {MAX_NOTE_LENGTH} characters",
+                    }
+                ), 400
+
+            if set_note(notes, service_id, content) and not save_notes(notes):
+                return jsonify({"success": False, "error": "Failed to save note"}), 500
+            version = notes.get(service_id, note)["version"]
+
+        return jsonify({"success": True, "version": version})
+    except Exception as e:
+        return error_response(e)
 
 
 @app.route("/api/quote", methods=["GET"])
@@ -321,19 +2806,26 @@ def get_quote():
         quote = random.choice(quotes)
         random.seed()  # Reset seed to default behavior
 
-        return jsonify({"success": True, "quote": quote})
+        # The quote only changes with the day or the quote list
+        return versioned_response(
+            {"success": True, "quote": quote},
+            f"quote-{seed}-{calendar_resource_versions()['quotes']}",
+        )
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/calendar-config", methods=["GET"])
 def get_calendar_config():
     """Get calendar configuration"""
     try:
-        config = load_calendar_config()
-        return jsonify({"success": True, "config": config})
+        config = get_store("calendar_config")
+        return versioned_response(
+            {"success": True, "config": config},
+            f"calendar-{store_version('calendar_config')}",
+        )
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/calendar-config", methods=["POST"])
@@ -343,13 +2835,21 @@ def save_calendar_config_endpoint():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
 
     try:
-        data = request.get_json()
+        data = read_json_body(MAX_CALENDAR_BODY_BYTES)
+    except RequestBodyError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
 
-        if not data or "config" not in data:
+    try:
+        if not isinstance(data, dict) or "config" not in data:
             return jsonify({"success": False, "error": "Invalid request data"}), 400
 
-        config = data["config"]
-        success = save_calendar_config(config)
+        errors = []
+        config = validate_calendar_config(data["config"], ("config",), errors)
+        if errors:
+            return validation_error_response(errors[:MAX_VALIDATION_ERRORS])
+
+        with _calendar_lock:
+            success = save_calendar_config(config)
 
         if success:
             return jsonify(
@@ -364,7 +2864,193 @@ def save_calendar_config_endpoint():
             ), 500
 
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
+
+
+def read_calendar_patch(validator):
+    """Validated partial update body; returns (patch, None) or (None, response)"""
+    try:
+        data = read_json_body(MAX_CALENDAR_BODY_BYTES)
+    except RequestBodyError as e:
+        return None, (jsonify({"success": False, "error": str(e)}), e.status)
+    errors = []
+    patch = validator(data, (), errors)
+    if errors:
+        return None, validation_error_response(errors[:MAX_VALIDATION_ERRORS])
+    return patch, None
+
+
+@app.route("/api/calendar/settings", methods=["GET"])
+def get_calendar_settings():
+    """Site title, date format and month names"""
+    try:
+        version = calendar_resource_versions()["settings"]
+        return versioned_response(
+            lambda: {
+                "success": True,
+                "settings": calendar_settings(get_store("calendar_config")),
+                "version": version,
+            },
+            f"calendar-settings-{version}",
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/calendar/settings", methods=["PATCH"])
+def patch_calendar_settings():
+    """Change some of the site settings - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    patch, failed = read_calendar_patch(validate_settings_patch)
+    if failed:
+        return failed
+    try:
+        base_version = patch.pop("base_version", None)
+        return update_calendar_resource(
+            "settings", base_version, lambda config: config.update(patch)
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/calendar/months/<int:month>", methods=["GET"])
+def get_calendar_month(month):
+    """Name and phrases of one month"""
+    if not 1 <= month <= 12:
+        return jsonify({"success": False, "error": "Month not found"}), 404
+    try:
+        version = calendar_resource_versions()[f"month-{month}"]
+        return versioned_response(
+            lambda: {
+                "success": True,
+                "month": month,
+                **calendar_month(get_store("calendar_config"), month),
+                "version": version,
+            },
+            f"calendar-month-{month}-{version}",
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/calendar/months/<int:month>", methods=["PATCH"])
+def patch_calendar_month(month):
+    """Change the name or phrases of one month - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    if not 1 <= month <= 12:
+        return jsonify({"success": False, "error": "Month not found"}), 404
+    patch, failed = read_calendar_patch(validate_month_patch)
+    if failed:
+        return failed
+
+    def change(config):
+        months = config.setdefault("months", {})
+        months[str(month)] = {**calendar_month(config, month), **patch}
+
+    try:
+        base_version = patch.pop("base_version", None)
+        return update_calendar_resource(f"month-{month}", base_version, change)
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/calendar/quotes", methods=["GET"])
+def get_calendar_quotes():
+    """A page of quotes (?offset=0&limit=50)"""
+    offset = request.args.get("offset", 0, type=int)
+    limit = request.args.get("limit", QUOTES_PAGE_SIZE, type=int)
+    if offset < 0 or not 1 <= limit <= MAX_QUOTES_PAGE_SIZE:
+        return jsonify(
+            {
+                "success": False,
+                "error": f"offset must be >= 0 and limit 1-{MAX_QUOTES_PAGE_SIZE}",
+            }
+        ), 400
+    try:
+        version = calendar_resource_versions()["quotes"]
+
+        def payload():
+            quotes = load_quotes()
+            return {
+                "success": True,
+                "quotes": quotes[offset : offset + limit],
+                "offset": offset,
+                "limit": limit,
+                "total": len(quotes),
+                "version": version,
+            }
+
+        return versioned_response(
+            payload, f"calendar-quotes-{version}-{offset}-{limit}"
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/calendar/quotes", methods=["PUT"])
+def replace_calendar_quotes():
+    """Replace the whole quotes collection - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    data, failed = read_calendar_patch(validate_quotes_replace)
+    if failed:
+        return failed
+    try:
+        return update_calendar_resource(
+            "quotes",
+            data.get("base_version"),
+            lambda config: config.update(quotes=data["quotes"]),
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/calendar/quotes", methods=["POST"])
+def add_calendar_quote():
+    """Append a quote - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    quote, failed = read_calendar_patch(validate_new_quote)
+    if failed:
+        return failed
+    try:
+        return update_calendar_resource(
+            "quotes",
+            None,
+            lambda config: config.setdefault("quotes", []).append(quote),
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/calendar/quotes/<int:index>", methods=["PATCH", "DELETE"])
+def change_calendar_quote(index):
+    """Edit or delete one quote by position - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    if request.method == "DELETE":
+        patch = {"base_version": request.args.get("base_version")}
+    else:
+        patch, failed = read_calendar_patch(validate_quote_patch)
+        if failed:
+            return failed
+
+    def change(config):
+        quotes = config.get("quotes", [])
+        if index >= len(quotes):
+            return jsonify({"success": False, "error": "Quote not found"}), 404
+        if request.method == "DELETE":
+            del quotes[index]
+        else:
+            quotes[index].update(patch)
+
+    try:
+        base_version = patch.pop("base_version", None)
+        return update_calendar_resource("quotes", base_version, change)
+    except Exception as e:
+        return error_response(e)
 
 
 @app.route("/api/calendar-phrase", methods=["POST"])
@@ -392,7 +3078,7 @@ def get_calendar_phrase():
         return jsonify({"success": True, "formatted_phrase": formatted_phrase})
 
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/suggestions", methods=["GET"])
@@ -409,7 +3095,7 @@ def get_suggestions():
 
         return jsonify({"success": True, "suggestions": suggestions})
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/suggestions", methods=["POST"])
@@ -429,20 +3115,22 @@ def submit_suggestion():
                 {"success": False, "error": "Suggestion must be 500 characters or less"}
             ), 400
 
-        suggestions = load_suggestions()
+        with _suggestions_lock:
+            suggestions = load_suggestions()
 
-        # Create new suggestion
-        new_suggestion = {
-            "id": len(suggestions) + 1,
-            "text": suggestion_text,
-            "votes": 0,
-            "created_at": datetime.now().isoformat(),
-            "voted_by": [],  # Track IPs to prevent duplicate votes
-        }
+            # Create new suggestion; one past the highest ID stays unique after deletes
+            new_suggestion = {
+                "id": max((s.get("id", 0) for s in suggestions), default=0) + 1,
+                "text": suggestion_text,
+                "votes": 0,
+                "created_at": datetime.now().isoformat(),
+                "voted_by": [],  # Track IPs to prevent duplicate votes
+            }
 
-        suggestions.append(new_suggestion)
+            suggestions.append(new_suggestion)
+            saved = save_suggestions(suggestions)
 
-        if save_suggestions(suggestions):
+        if saved:
             return jsonify(
                 {
                     "success": True,
@@ -456,7 +3144,7 @@ def submit_suggestion():
             ), 500
 
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/suggestions/<int:suggestion_id>/vote", methods=["POST"])
@@ -466,55 +3154,50 @@ def vote_suggestion(suggestion_id):
         data = request.get_json()
         vote_type = data.get("type", "up")  # 'up' or 'down'
 
-        # Initialize cooldown tracking in session
-        if "vote_cooldowns" not in session:
-            session["vote_cooldowns"] = {}
-
-        current_time = datetime.now().timestamp()
-        cooldown_key = f"{suggestion_id}_{vote_type}"
-        last_vote_time = session["vote_cooldowns"].get(cooldown_key, 0)
-
-        # Prevent spam: minimum 60 seconds (1 minute) between votes
-        time_diff = current_time - last_vote_time
-        if time_diff < 60:
-            wait_time = int(60 - time_diff)
-            return jsonify(
-                {
-                    "success": False,
-                    "error": f"Please wait {wait_time} seconds before voting again",
-                }
-            ), 429
-
-        suggestions = load_suggestions()
-
-        # Find the suggestion
-        suggestion = next(
-            (s for s in suggestions if s.get("id") == suggestion_id), None
-        )
+        with _suggestions_lock:
+            suggestions = load_suggestions()
 
-        if not suggestion:
-            return jsonify({"success": False, "error": "Suggestion not found"}), 404
+            # Find the suggestion
+            suggestion = next(
+                (s for s in suggestions if s.get("id") == suggestion_id), None
+            )
 
-        # Initialize vote tracking fields
-        if "upvotes" not in suggestion:
-            suggestion["upvotes"] = 0
-        if "downvotes" not in suggestion:
-            suggestion["downvotes"] = 0
+            if not suggestion:
+                return jsonify({"success": False, "error": "Suggestion not found"}), 404
+
+            # Prevent spam: minimum 60 seconds (1 minute) between votes. The
+            # cooldown is kept by the coordinator so every node enforces it;
+            # it starts only for a suggestion that exists.
+            if "client_id" not in session:
+                session["client_id"] = uuid.uuid4().hex
+            cooldown_key = f"vote:{session['client_id']}:{suggestion_id}_{vote_type}"
+            wait_time = coordinator.acquire_cooldown(cooldown_key, VOTE_COOLDOWN)
+            if wait_time > 0:
+                return jsonify(
+                    {
+                        "success": False,
+                        "error": f"Please wait {int(wait_time)} seconds "
+                        "before voting again",
+                    }
+                ), 429
 
-        # Add vote (no checking for duplicates, anyone can vote anytime after cooldown)
-        if vote_type == "up":
-            suggestion["upvotes"] += 1
-        elif vote_type == "down":
-            suggestion["downvotes"] += 1
+            # Initialize vote tracking fields
+            if "upvotes" not in suggestion:
+                suggestion["upvotes"] = 0
+            if "downvotes" not in suggestion:
+                suggestion["downvotes"] = 0
 
-        # Calculate net score for sorting
-        suggestion["score"] = suggestion["upvotes"] - suggestion["downvotes"]
+            # Add vote (no checking for duplicates, anyone can vote anytime after cooldown)
+            if vote_type == "up":
+                suggestion["upvotes"] += 1
+            elif vote_type == "down":
+                suggestion["downvotes"] += 1
 
-        # Update cooldown
-        session["vote_cooldowns"][cooldown_key] = current_time
-        session.modified = True
+            # Calculate net score for sorting
+            suggestion["score"] = suggestion["upvotes"] - suggestion["downvotes"]
+            saved = save_suggestions(suggestions)
 
-        if save_suggestions(suggestions):
+        if saved:
             return jsonify(
                 {
                     "success": True,
@@ -528,7 +3211,7 @@ def vote_suggestion(suggestion_id):
             return jsonify({"success": False, "error": "Failed to save vote"}), 500
 
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/suggestions/<int:suggestion_id>", methods=["PUT"])
@@ -551,20 +3234,22 @@ def edit_suggestion(suggestion_id):
                 {"success": False, "error": "Suggestion must be 500 characters or less"}
             ), 400
 
-        suggestions = load_suggestions()
+        with _suggestions_lock:
+            suggestions = load_suggestions()
 
-        # Find the suggestion
-        suggestion = next(
-            (s for s in suggestions if s.get("id") == suggestion_id), None
-        )
+            # Find the suggestion
+            suggestion = next(
+                (s for s in suggestions if s.get("id") == suggestion_id), None
+            )
 
-        if not suggestion:
-            return jsonify({"success": False, "error": "Suggestion not found"}), 404
+            if not suggestion:
+                return jsonify({"success": False, "error": "Suggestion not found"}), 404
 
-        # Update the text
-        suggestion["text"] = new_text
+            # Update the text
+            suggestion["text"] = new_text
+            saved = save_suggestions(suggestions)
 
-        if save_suggestions(suggestions):
+        if saved:
             return jsonify(
                 {
                     "success": True,
@@ -578,7 +3263,7 @@ def edit_suggestion(suggestion_id):
             ), 500
 
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/suggestions/<int:suggestion_id>", methods=["DELETE"])
@@ -588,19 +3273,21 @@ def delete_suggestion(suggestion_id):
         return jsonify({"success": False, "error": "Unauthorized"}), 401
 
     try:
-        suggestions = load_suggestions()
+        with _suggestions_lock:
+            suggestions = load_suggestions()
 
-        # Find and remove the suggestion
-        suggestion = next(
-            (s for s in suggestions if s.get("id") == suggestion_id), None
-        )
+            # Find and remove the suggestion
+            suggestion = next(
+                (s for s in suggestions if s.get("id") == suggestion_id), None
+            )
 
-        if not suggestion:
-            return jsonify({"success": False, "error": "Suggestion not found"}), 404
+            if not suggestion:
+                return jsonify({"success": False, "error": "Suggestion not found"}), 404
 
-        suggestions.remove(suggestion)
+            suggestions.remove(suggestion)
+            saved = save_suggestions(suggestions)
 
-        if save_suggestions(suggestions):
+        if saved:
             return jsonify(
                 {"success": True, "message": "Suggestion deleted successfully"}
             )
@@ -610,29 +3297,584 @@ def delete_suggestion(suggestion_id):
             ), 500
 
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
-def load_default_visibility():
-    """Load default visibility configuration"""
-    try:
-        if os.path.exists(DEFAULT_VISIBILITY_FILE):
-            with open(DEFAULT_VISIBILITY_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+def read_default_visibility_file():
+    """Read default visibility configuration from JSON file"""
+    if not os.path.exists(DEFAULT_VISIBILITY_FILE):
         return {}
-    except Exception as e:
-        print(f"Error loading default visibility: {e}")
+    return read_json_file("default_visibility", DEFAULT_VISIBILITY_FILE, {})
+
+
+def read_visibility_profiles_file():
+    """Read visibility profiles from JSON file"""
+    if not os.path.exists(VISIBILITY_PROFILES_FILE):
         return {}
+    data = read_json_file("visibility_profiles", VISIBILITY_PROFILES_FILE, {})
+    return data.get("profiles", {})
+
+
+def save_visibility_profiles(profiles):
+    """Save visibility profiles to JSON file"""
+    try:
+        data = {"profiles": profiles, "last_updated": datetime.now().isoformat()}
+        write_json_file("visibility_profiles", VISIBILITY_PROFILES_FILE, data)
+        reload_store("visibility_profiles")
+        return True
+    except Exception:
+        logger.exception("Error saving visibility profiles")
+        return False
+
+
+def selected_visibility_profile():
+    """Profile named by ?profile= or the device's profile cookie, if any
+
+    An empty ?profile= explicitly selects the unfiltered list.
+    """
+    name = request.args.get("profile")
+    if name is None:
+        name = request.cookies.get(VISIBILITY_PROFILE_COOKIE)
+    return name or None
+
+
+def remember_visibility_profile(response):
+    """Store a ?profile= choice in a cookie so the device keeps using it"""
+    if "profile" not in request.args:
+        return response
+    name = request.args["profile"]
+    if name:
+        response.set_cookie(
+            VISIBILITY_PROFILE_COOKIE, name, max_age=365 * 24 * 3600, samesite="Lax"
+        )
+    else:
+        response.delete_cookie(VISIBILITY_PROFILE_COOKIE)
+    return response
+
+
+def visible_services(services, profile):
+    """Services a profile shows: its "show" list if any, minus its "hide" list"""
+    hidden = set(profile.get("hide", ()))
+    if "show" in profile:
+        shown = set(profile["show"])
+        return [s for s in services if s["id"] in shown and s["id"] not in hidden]
+    return [s for s in services if s["id"] not in hidden]
+
+
+# Command palette search index
+#
+# Built once per services payload (services version and visibility
+# profile) and shipped with it, so clients rank results with a few map
+# lookups per keystroke instead of scanning every card.
+SEARCH_INDEX_CACHE_SIZE = 8  # Recently built indexes kept in memory
+_search_index_cache = {}  # payload ETag -> index
+_search_index_lock = threading.Lock()
+
+
+def normalize_search_text(text):
+    """Lowercase words of text joined by single spaces"""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def build_search_index(services):
+    """Prefix and trigram index over names, descriptions, URLs and url-group entries
+
+    entries holds one item per service and per url-group entry; prefixes
+    maps the first one or two letters of every word, and trigrams every
+    three-letter run, to the entries containing them.
+    """
+    entries = []
+
+    def add(service, mini_index, name, url, icon, context):
+        text = normalize_search_text(" ".join(filter(None, (name, context, url))))
+        entries.append(
+            {
+                "s": service["id"],
+                "m": mini_index,
+                "n": name,
+                "u": url,
+                "i": icon,
+                "t": text,
+            }
+        )
+
+    for service in services:
+        kind = service.get("type", "url")
+        url = service.get("url") if kind == "url" else service.get("iframe_url")
+        add(
+            service,
+            None,
+            service.get("name", ""),
+            url,
+            service.get("icon"),
+            service.get("description", ""),
+        )
+        if kind == "url-group":
+            for i, mini in enumerate(service.get("services", [])):
+                add(
+                    service,
+                    i,
+                    mini.get("name", ""),
+                    mini.get("url"),
+                    mini.get("icon"),
+                    service.get("name", ""),
+                )
+
+    prefixes = {}
+    trigrams = {}
+    for position, entry in enumerate(entries):
+        for word in set(entry["t"].split()):
+            prefixes.setdefault(word[:1], set()).add(position)
+            if len(word) > 1:
+                prefixes.setdefault(word[:2], set()).add(position)
+        text = entry["t"]
+        for gram in {text[i : i + 3] for i in range(len(text) - 2)}:
+            if " " not in gram:
+                trigrams.setdefault(gram, set()).add(position)
+
+    return {
+        "entries": entries,
+        "prefixes": {key: sorted(ids) for key, ids in prefixes.items()},
+        "trigrams": {key: sorted(ids) for key, ids in trigrams.items()},
+    }
+
+
+def get_search_index(services, etag):
+    """Search index of a services payload, built once per payload version"""
+    with _search_index_lock:
+        index = _search_index_cache.get(etag)
+    observe_cache_lookup("search_index", index is not None)
+    if index is None:
+        index = build_search_index(services)
+        with _search_index_lock:
+            _search_index_cache[etag] = index
+            while len(_search_index_cache) > SEARCH_INDEX_CACHE_SIZE:
+                del _search_index_cache[next(iter(_search_index_cache))]
+    return index
+
+
+# Iframe embeddability
+#
+# Sites that refuse to be framed (X-Frame-Options or CSP frame-ancestors)
+# are shown as links instead of an empty frame. A background job fetches
+# the headers of every iframe_url and caches the policy per URL; the
+# verdict for the dashboard's own origin is worked out per request.
+EMBED_CHECK_TTL = 6 * 3600  # Seconds a fetched policy is trusted
+EMBED_CHECK_RETRY = 300  # Seconds before an unreachable URL is tried again
+EMBED_CHECK_TIMEOUT = 5
+EMBED_CHECK_WORKERS = 4
+_embed_policies = {}  # url -> fetched framing headers and when they were checked
+_embed_pending = set()
+_embed_lock = threading.Lock()
+_embed_executor = None
+
+
+def iframe_urls(services):
+    """Distinct http(s) iframe URLs of the iframe services"""
+    urls = []
+    for service in services:
+        url = service.get("iframe_url") or ""
+        if service.get("type") == "iframe" and url.startswith(("http://", "https://")):
+            urls.append(url)
+    return list(dict.fromkeys(urls))
+
+
+def fetch_frame_policy(url):
+    """X-Frame-Options and the CSP frame-ancestors source lists sent with url"""
+    import requests
+
+    with requests.get(
+        url,
+        timeout=EMBED_CHECK_TIMEOUT,
+        stream=True,  # Only the headers are needed
+        headers={"User-Agent": "Homely embed check"},
+    ) as response:
+        headers = response.headers
+    frame_ancestors = []
+    # Repeated headers arrive joined with commas, which also separate policies
+    for policy in headers.get("Content-Security-Policy", "").split(","):
+        for directive in policy.split(";"):
+            name, _, value = directive.strip().partition(" ")
+            if name.lower() == "frame-ancestors":
+                frame_ancestors.append(value.lower().split())
+    return {
+        "reachable": True,
+        "x_frame_options": headers.get("X-Frame-Options", "").strip().lower(),
+        "frame_ancestors": frame_ancestors,
+    }
+
+
+def check_embed_policy(url):
+    """Fetch and cache the framing policy of url"""
+    import requests
+
+    try:
+        policy = fetch_frame_policy(url)
+    except requests.RequestException as e:
+        logger.info("Embed check of %s failed: %s", url, e)
+        policy = {"reachable": False}
+    except Exception:
+        # Anything else (a malformed header, say) must not leave url pending
+        logger.exception("Embed check of %s failed", url)
+        policy = {"reachable": False}
+    policy["checked_at"] = time.time()
+    with _embed_lock:
+        _embed_pending.discard(url)
+        _embed_policies[url] = policy
+
+
+def schedule_embed_checks(urls):
+    """Queue checks for the URLs without a fresh policy; returns how many are pending"""
+    global _embed_executor
+    now = time.time()
+    with _embed_lock:
+        for url in urls:
+            policy = _embed_policies.get(url)
+            if policy is not None:
+                ttl = EMBED_CHECK_TTL if policy["reachable"] else EMBED_CHECK_RETRY
+                if now - policy["checked_at"] < ttl:
+                    continue
+            if url in _embed_pending:
+                continue
+            if _embed_executor is None:
+                _embed_executor = ThreadPoolExecutor(
+                    max_workers=EMBED_CHECK_WORKERS, thread_name_prefix="embed-check"
+                )
+            _embed_pending.add(url)
+            _embed_executor.submit(check_embed_policy, url)
+        return len(_embed_pending)
+
+
+@on_store_change
+def refresh_embed_checks(store):
+    """Check new iframe URLs as soon as they are saved and forget removed ones"""
+    if store != "services":
+        return
+    urls = iframe_urls(get_store("services"))
+    with _embed_lock:
+        for url in set(_embed_policies) - set(urls):
+            del _embed_policies[url]
+    schedule_embed_checks(urls)
+
+
+def _origin_of(url):
+    parts = urlsplit(url)
+    default_port = {"http": 80, "https": 443}.get(parts.scheme)
+    return parts.scheme, parts.hostname or "", parts.port or default_port
+
+
+def _frame_source_matches(source, origin, target):
+    """Whether a frame-ancestors source expression allows origin"""
+    scheme, host, port = origin
+    if source == "*":
+        return scheme in ("http", "https")
+    if source == "'self'":
+        return origin == target
+    if source.endswith(":") and "/" not in source:
+        return scheme == source[:-1]
+    source_scheme, sep, rest = source.partition("://")
+    if not sep:
+        source_scheme, rest = None, source
+    if source_scheme and source_scheme != scheme:
+        return False
+    source_host, _, source_port = rest.split("/", 1)[0].partition(":")
+    if source_port and source_port != "*" and source_port != str(port):
+        return False
+    if source_host.startswith("*."):
+        return host.endswith(source_host[1:])
+    return host == source_host
+
+
+def embed_verdict(url, dashboard_url):
+    """True if url can be framed by the dashboard, False if not, None if unknown"""
+    with _embed_lock:
+        policy = _embed_policies.get(url)
+    if policy is None or not policy["reachable"]:
+        return None
+    origin = _origin_of(dashboard_url)
+    target = _origin_of(url)
+    # frame-ancestors replaces X-Frame-Options; every policy has to allow us
+    if policy["frame_ancestors"]:
+        return all(
+            any(_frame_source_matches(source, origin, target) for source in sources)
+            for sources in policy["frame_ancestors"]
+        )
+    if policy["x_frame_options"] == "deny":
+        return False
+    if policy["x_frame_options"] == "sameorigin":
+        return origin == target
+    return True
+
+
+# Feeds
+#
+# Feed cards (RSS, Atom or JSON Feed) are read through the server, so any
+# number of open panels cause at most one upstream request per feed and
+# refresh interval. Requests are conditional (ETag / Last-Modified) and
+# share one pooled session; the parsed items of the most recently used
+# feeds are kept in memory.
+FEED_FETCH_TIMEOUT = 10
+FEED_MAX_BYTES = 2 * 1024 * 1024
+FEED_MAX_ITEMS = 50  # Parsed items kept per feed
+FEED_CACHE_SIZE = 100  # Feeds kept in memory
+FEED_SUMMARY_LENGTH = 300
+FEED_POOL_SIZE = 10
+_feed_cache = {}  # url -> parsed items and validators, least recently used first
+_feed_fetch_locks = {}  # url -> lock held while the feed is being fetched
+_feed_lock = threading.Lock()
+_feed_session = None
+
+
+class FeedError(Exception):
+    """A feed could not be fetched or parsed"""
+
+
+def get_feed_session():
+    """Shared HTTP session, so feed requests reuse their connections"""
+    global _feed_session
+    import requests
+
+    with _feed_lock:
+        if _feed_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=FEED_POOL_SIZE, pool_maxsize=FEED_POOL_SIZE
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "Homely feed reader"
+            _feed_session = session
+        return _feed_session
+
+
+def _feed_text(value):
+    """Plain text of a feed field that may hold HTML"""
+    text = unescape(re.sub(r"<[^>]+>", " ", value or ""))
+    text = " ".join(text.split())
+    if len(text) > FEED_SUMMARY_LENGTH:
+        text = text[: FEED_SUMMARY_LENGTH - 1].rstrip() + "\u2026"
+    return text
+
+
+def _feed_date(value):
+    """ISO 8601 form of an RFC 822 (RSS) or ISO 8601 (Atom, JSON) date"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).isoformat()
+    except (TypeError, ValueError):
+        return value
+
+
+def _local_name(element):
+    return element.tag.rsplit("}", 1)[-1]
+
+
+def _child_text(element, name):
+    for child in element:
+        if _local_name(child) == name:
+            return "".join(child.itertext())
+    return ""
+
+
+def _entry_link(element):
+    """href of an Atom entry's alternate link, or the text of an RSS link"""
+    links = [child for child in element if _local_name(child) == "link"]
+    for link in links:
+        if link.get("href") and link.get("rel", "alternate") == "alternate":
+            return link.get("href")
+    for link in links:
+        if link.get("href") or (link.text or "").strip():
+            return link.get("href") or link.text.strip()
+    return ""
+
+
+def _feed_link(link, base_url):
+    """An item link resolved against the feed URL, or "" unless http(s)
+
+    Links come from third-party feeds, so a javascript: or data: URL must
+    never reach an href on the dashboard.
+    """
+    link = urljoin(base_url, link.strip())
+    return link if urlsplit(link).scheme in ("http", "https") else ""
+
+
+def parse_feed(body, base_url=""):
+    """Title and items of an RSS 1.0/2.0, Atom or JSON feed
+
+    Relative item links are resolved against base_url, the feed's URL.
+    """
+    from xml.etree import ElementTree
+
+    if body.lstrip()[:1] in (b"{", "{"):
+        try:
+            feed = json.loads(body)
+        except ValueError as e:
+            raise FeedError(f"invalid JSON feed: {e}") from e
+        if not isinstance(feed, dict) or not isinstance(feed.get("items"), list):
+            raise FeedError("JSON feed has no items")
+        items = [
+            {
+                "title": _feed_text(str(item.get("title") or "")),
+                "link": _feed_link(
+                    str(item.get("url") or item.get("external_url") or ""), base_url
+                ),
+                "published": _feed_date(str(item.get("date_published") or "")),
+                "summary": _feed_text(
+                    str(
+                        item.get("summary")
+                        or item.get("content_text")
+                        or item.get("content_html")
+                        or ""
+                    )
+                ),
+            }
+            for item in feed["items"][:FEED_MAX_ITEMS]
+            if isinstance(item, dict)
+        ]
+        return _feed_text(str(feed.get("title") or "")), items
+
+    try:
+        root = ElementTree.fromstring(body)
+    except ElementTree.ParseError as e:
+        raise FeedError(f"invalid XML feed: {e}") from e
+    if _local_name(root) not in ("rss", "RDF", "feed"):
+        raise FeedError(f"not a feed (<{_local_name(root)}>)")
+
+    channel = next((e for e in root if _local_name(e) == "channel"), root)
+    entries = [e for e in root.iter() if _local_name(e) in ("item", "entry")]
+    items = [
+        {
+            "title": _feed_text(_child_text(entry, "title")),
+            "link": _feed_link(_entry_link(entry), base_url),
+            "published": _feed_date(
+                _child_text(entry, "pubDate")
+                or _child_text(entry, "published")
+                or _child_text(entry, "updated")
+                or _child_text(entry, "date")
+            ),
+            "summary": _feed_text(
+                _child_text(entry, "description")
+                or _child_text(entry, "summary")
+                or _child_text(entry, "content")
+            ),
+        }
+        for entry in entries[:FEED_MAX_ITEMS]
+    ]
+    return _feed_text(_child_text(channel, "title")), items
+
+
+def fetch_feed(url, cached):
+    """Conditionally fetch url: (title, items, validators), or None if unchanged"""
+    import requests
+
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        with get_feed_session().get(
+            url, headers=headers, timeout=FEED_FETCH_TIMEOUT, stream=True
+        ) as response:
+            if response.status_code == 304 and cached:
+                return None
+            if response.status_code != 200:
+                raise FeedError(f"HTTP {response.status_code}")
+            body = response.raw.read(FEED_MAX_BYTES + 1, decode_content=True)
+            if len(body) > FEED_MAX_BYTES:
+                raise FeedError("feed is too large")
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    except requests.RequestException as e:
+        raise FeedError(str(e)) from e
+    title, items = parse_feed(body, url)
+    return title, items, validators
+
+
+def get_feed(url, interval):
+    """Cached entry of a feed, refetched at most once per interval seconds
+
+    Concurrent callers of a stale feed wait for a single fetch. A failed
+    fetch keeps serving the previous items and is retried next interval.
+    """
+    with _feed_lock:
+        lock = _feed_fetch_locks.setdefault(url, threading.Lock())
+    with lock:
+        with _feed_lock:
+            cached = _feed_cache.pop(url, None)
+            if cached is not None:
+                _feed_cache[url] = cached  # Most recently used last
+        fresh = cached is not None and time.time() - cached["checked_at"] < interval
+        observe_cache_lookup("feed", fresh)
+        if fresh:
+            return cached
+
+        entry = dict(cached or {"version": 0, "title": "", "items": []})
+        entry["checked_at"] = time.time()
+        try:
+            fetched = fetch_feed(url, cached)
+            entry["error"] = None
+            if fetched is not None:
+                entry["title"], entry["items"], validators = fetched
+                entry.update(validators)
+                entry["version"] += 1
+        except FeedError as e:
+            logger.warning("Fetching feed %s failed: %s", url, e)
+            entry["error"] = str(e)
+        except Exception:
+            # Still cached, so a broken feed is retried next interval only
+            logger.exception("Fetching feed %s failed", url)
+            entry["error"] = "Feed could not be read"
+
+        with _feed_lock:
+            _feed_cache.pop(url, None)
+            _feed_cache[url] = entry
+            while len(_feed_cache) > FEED_CACHE_SIZE:
+                evicted = next(iter(_feed_cache))
+                del _feed_cache[evicted]
+                _feed_fetch_locks.pop(evicted, None)
+        return entry
+
+
+@on_store_change
+def prune_feed_cache(store):
+    """Forget feeds no card uses any more"""
+    if store != "services":
+        return
+    urls = {s.get("feed_url") for s in get_store("services") if s.get("type") == "feed"}
+    with _feed_lock:
+        for url in set(_feed_cache) - urls:
+            del _feed_cache[url]
+            _feed_fetch_locks.pop(url, None)
+
+
+def read_nuke_timestamps():
+    """Read the nuke timestamp files"""
+    timestamps = {}
+    for field, path in (
+        ("timestamp", NUKE_TIMESTAMP_FILE),
+        ("visibility_timestamp", NUKE_VISIBILITY_TIMESTAMP_FILE),
+    ):
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                timestamps[field] = f.read().strip()
+        else:
+            timestamps[field] = None
+    return timestamps
 
 
 def save_default_visibility(visibility):
     """Save default visibility configuration"""
     try:
-        with open(DEFAULT_VISIBILITY_FILE, "w", encoding="utf-8") as f:
-            json.dump(visibility, f, indent=2, ensure_ascii=False)
+        write_json_file("default_visibility", DEFAULT_VISIBILITY_FILE, visibility)
+        reload_store("default_visibility")
         return True
-    except Exception as e:
-        print(f"Error saving default visibility: {e}")
+    except Exception:
+        logger.exception("Error saving default visibility")
         return False
 
 
@@ -640,10 +3882,10 @@ def save_default_visibility(visibility):
 def get_default_visibility():
     """Get default card visibility configuration for new users"""
     try:
-        visibility = load_default_visibility()
+        visibility = get_store("default_visibility")
         return jsonify({"success": True, "visibility": visibility})
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/default-visibility", methods=["POST"])
@@ -671,7 +3913,65 @@ def set_default_visibility():
                 }
             ), 500
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
+
+
+@app.route("/api/visibility-profiles", methods=["GET"])
+def get_visibility_profiles():
+    """Get all visibility profiles (admin only)"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+
+    try:
+        return jsonify({"success": True, "profiles": get_store("visibility_profiles")})
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/visibility-profiles/<name>", methods=["PUT"])
+def set_visibility_profile(name):
+    """Create or replace a visibility profile (admin only)"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+
+    try:
+        data = read_json_body(MAX_SERVICES_BODY_BYTES)
+    except RequestBodyError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+
+    errors = []
+    _check_profile_names((name,), ("profile",), errors)
+    profile = validate_visibility_profile(data, ("profile",), errors)
+    if errors:
+        return validation_error_response(errors[:MAX_VALIDATION_ERRORS])
+
+    try:
+        profiles = copy.deepcopy(get_store("visibility_profiles"))
+        profiles[name] = profile
+        if save_visibility_profiles(profiles):
+            return jsonify({"success": True, "message": f'Profile "{name}" saved'})
+        else:
+            return jsonify({"success": False, "error": "Failed to save profile"}), 500
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/visibility-profiles/<name>", methods=["DELETE"])
+def delete_visibility_profile(name):
+    """Delete a visibility profile (admin only)"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+
+    try:
+        profiles = copy.deepcopy(get_store("visibility_profiles"))
+        if profiles.pop(name, None) is None:
+            return jsonify({"success": False, "error": "Profile not found"}), 404
+        if save_visibility_profiles(profiles):
+            return jsonify({"success": True, "message": f'Profile "{name}" deleted'})
+        else:
+            return jsonify({"success": False, "error": "Failed to delete profile"}), 500
+    except Exception as e:
+        return error_response(e)
 
 
 @app.route("/api/nuke-cookies", methods=["POST"])
@@ -685,8 +3985,9 @@ def nuke_cookies():
         timestamp = datetime.now().isoformat()
 
         # Save timestamp to a file that all clients will check
-        with open("nuke_timestamp.txt", "w") as f:
+        with open(NUKE_TIMESTAMP_FILE, "w") as f:
             f.write(timestamp)
+        reload_store("nuke", force=True)
 
         return jsonify(
             {
@@ -696,7 +3997,7 @@ def nuke_cookies():
             }
         )
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/nuke-visibility", methods=["POST"])
@@ -710,8 +4011,9 @@ def nuke_visibility():
         timestamp = datetime.now().isoformat()
 
         # Save timestamp to a file that all clients will check
-        with open("nuke_visibility_timestamp.txt", "w") as f:
+        with open(NUKE_VISIBILITY_TIMESTAMP_FILE, "w") as f:
             f.write(timestamp)
+        reload_store("nuke", force=True)
 
         return jsonify(
             {
@@ -721,32 +4023,81 @@ def nuke_visibility():
             }
         )
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/api/nuke-timestamp", methods=["GET"])
-def get_nuke_timestamp():
-    """Get the current nuke timestamps"""
+@app.route("/api/embed-status", methods=["GET"])
+def get_embed_status():
+    """Whether each iframe URL can be embedded here (null while unknown)"""
     try:
-        result = {"success": True}
+        urls = iframe_urls(get_store("services"))
+        pending = schedule_embed_checks(urls)
+        status = {url: embed_verdict(url, request.host_url) for url in urls}
+        return jsonify({"success": True, "status": status, "pending": pending})
+    except Exception as e:
+        return error_response(e)
 
-        # Check for full nuke timestamp
-        if os.path.exists("nuke_timestamp.txt"):
-            with open("nuke_timestamp.txt", "r") as f:
-                result["timestamp"] = f.read().strip()
-        else:
-            result["timestamp"] = None
 
-        # Check for visibility-only nuke timestamp
-        if os.path.exists("nuke_visibility_timestamp.txt"):
-            with open("nuke_visibility_timestamp.txt", "r") as f:
-                result["visibility_timestamp"] = f.read().strip()
-        else:
-            result["visibility_timestamp"] = None
+@app.route("/api/feed/<service_id>", methods=["GET"])
+def get_feed_items(service_id):
+    """Latest items of a feed card, fetched through the shared feed cache"""
+    try:
+        service = next(
+            (
+                s
+                for s in get_store("services")
+                if s.get("id") == service_id and s.get("type") == "feed"
+            ),
+            None,
+        )
+        if service is None:
+            return jsonify({"success": False, "error": "Feed not found"}), 404
+
+        url = service["feed_url"]
+        limit = service.get("feed_max_items", 5)
+        entry = get_feed(url, service.get("feed_interval", 900))
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+        return versioned_response(
+            {
+                "success": True,
+                "title": entry["title"],
+                "items": entry["items"][:limit],
+                "error": entry["error"],
+            },
+            f"feed-{digest}-{entry['version']}-{limit}-{bool(entry['error'])}",
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/changes", methods=["GET"])
+def get_changes():
+    """What changed in every store after ?since=<revision>
+
+    Without since, only the current revision is returned, as a starting
+    cursor. changed is null where the whole store should be refetched.
+    """
+    since = request.args.get("since", type=int)
+    if since is None:
+        return jsonify({"success": True, "revision": current_revision(), "changes": {}})
+    revision, changes = changes_since(since)
+    if changes is None:
+        stores = {store: store_version(store) for store in get_store_specs()}
+        return jsonify(
+            {"success": True, "revision": revision, "reset": True, "stores": stores}
+        )
+    return jsonify(
+        {"success": True, "revision": revision, "reset": False, "changes": changes}
+    )
 
-        return jsonify(result)
+
+@app.route("/api/nuke-timestamp", methods=["GET"])
+def get_nuke_timestamp():
+    """Get the current nuke timestamps"""
+    try:
+        return jsonify({"success": True, **get_store("nuke")})
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return error_response(e)
 
 
 @app.route("/api/health", methods=["GET"])
@@ -765,6 +4116,81 @@ def health_check():
     )
 
 
+@app.route("/api/health/live", methods=["GET"])
+def liveness_check():
+    """Liveness probe - answers as long as the process can serve requests"""
+    return jsonify(
+        {
+            "status": "alive",
+            "worker_id": WORKER_ID,
+            "uptime_seconds": round(time.time() - PROCESS_START_TIME, 3),
+        }
+    )
+
+
+@app.route("/api/health/ready", methods=["GET"])
+def readiness_check():
+    """Readiness probe - answers from in-memory store state, ?deep=1 re-validates"""
+    result = {
+        "worker_id": WORKER_ID,
+        "uptime_seconds": round(time.time() - PROCESS_START_TIME, 3),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    stores = get_store_status()
+    if request.args.get("deep") == "1":
+        checks, age, cached = run_deep_health_check()
+        result["deep"] = {"checks": checks, "age_seconds": age, "cached": cached}
+        stores = get_store_status()
+        ready = all(check["ok"] for check in checks.values())
+    else:
+        # A store nothing has loaded yet is read on first use, not by the probe
+        ready = all(status["last_error"] is None for status in stores.values())
+        result["not_loaded"] = sorted(set(get_store_files()) - set(stores))
+    ready = ready and _startup["ready"]
+
+    result["startup"] = _startup
+    result["stores"] = stores
+    result["backup_count"] = stores.get("services", {}).get("backups")
+    result["status"] = "ready" if ready else "not_ready"
+    return jsonify(result), 200 if ready else 503
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/admin/profiles", methods=["GET"])
+def get_profiles():
+    """List recent request profiles - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+
+    try:
+        profiles = list_profiles()
+        return jsonify({"success": True, "profiles": profiles, "count": len(profiles)})
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/admin/profiles/<name>.<any(pstats, collapsed):kind>", methods=["GET"])
+def download_profile(name, kind):
+    """Download the pstats or collapsed-stack output of a profile - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+
+    from flask import send_from_directory
+
+    return send_from_directory(
+        os.path.abspath(PROFILE_DIR),
+        f"{name}.{kind}",
+        mimetype="text/plain" if kind == "collapsed" else "application/octet-stream",
+        as_attachment=True,
+    )
+
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"success": False, "error": "Endpoint not found"}), 404
@@ -775,6 +4201,342 @@ def internal_error(error):
     return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    request_id = request.headers.get("X-Request-ID", "")
+    if not REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid.uuid4().hex
+    g.request_id = request_id
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        observe_request(
+            request.method,
+            route,
+            response.status_code,
+            time.perf_counter() - started,
+        )
+    return response
+
+
+@app.after_request
+def log_request(response):
+    started = g.get("request_started")
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    if g.get("request_id"):
+        response.headers["X-Request-ID"] = g.request_id
+    rate = ACCESS_LOG_SAMPLING.get(route, 1.0)
+    if response.status_code < 400 and rate < 1.0 and random.random() >= rate:
+        return response
+    duration_ms = (
+        round((time.perf_counter() - started) * 1000, 3)
+        if started is not None
+        else None
+    )
+    logger.info(
+        "%s %s %s",
+        request.method,
+        request.path,
+        response.status_code,
+        extra={
+            "method": request.method,
+            "route": route,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": duration_ms,
+            "remote_addr": request.remote_addr,
+            "bytes": response.content_length,
+        },
+    )
+    return response
+
+
+# Usage analytics
+#
+# Clicks on url, url-group and search tiles arrive as beacons. Recording one
+# only appends to a deque, which takes no lock; every USAGE_FLUSH_INTERVAL a
+# background thread folds the pending clicks into hourly counts and merges
+# them into USAGE_FILE. There, hours older than USAGE_HOURLY_DAYS are
+# compacted into days and days older than USAGE_RETENTION_DAYS are dropped.
+# Workers sharing the file merge into it under a file lock.
+USAGE_FILE = "usage_stats.json"
+USAGE_FLUSH_INTERVAL = 60
+USAGE_HOURLY_DAYS = 2
+USAGE_RETENTION_DAYS = 90
+USAGE_MAX_PENDING = 100000  # Clicks held between flushes; the oldest go first
+USAGE_BEACON_MAX_BYTES = 1024
+USAGE_PERIODS = {"day": 86400, "week": 7 * 86400, "month": 30 * 86400}
+USAGE_AUTO_SORT = None  # Period to re-sort tiles by after each flush, or None
+USAGE_TILE_TYPES = ("url", "url-group", "search")
+_usage_clicks = deque(maxlen=USAGE_MAX_PENDING)  # (service id, hour)
+_usage_flush_lock = threading.Lock()
+_usage_targets = {"data": None, "ids": frozenset()}
+_usage_flusher = None
+_usage_flusher_stop = threading.Event()
+
+
+def usage_target_ids():
+    """IDs of the tiles whose clicks are counted, worked out once per services"""
+    global _usage_targets
+    services = get_store("services")
+    cached = _usage_targets
+    if cached["data"] is services:
+        return cached["ids"]
+    ids = frozenset(
+        str(service["id"])
+        for service in services
+        if service.get("type") in USAGE_TILE_TYPES
+    )
+    _usage_targets = {"data": services, "ids": ids}
+    return ids
+
+
+@contextmanager
+def usage_file_lock():
+    """Hold the lock that serializes read-modify-writes of USAGE_FILE"""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{USAGE_FILE}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def read_usage_file():
+    """The usage rollup: {"hours": {start: {id: clicks}}, "days": {...}}"""
+    try:
+        with open(USAGE_FILE, "rb") as f:
+            rollup = parse_json_bytes(f.read())
+    except FileNotFoundError:
+        rollup = {}
+    except ValueError:
+        logger.error("Discarding unreadable %s", USAGE_FILE)
+        rollup = {}
+    rollup.setdefault("hours", {})
+    rollup.setdefault("days", {})
+    return rollup
+
+
+def compact_usage(rollup, now):
+    """Fold old hours into days and drop expired days; True if anything moved"""
+    hour_cutoff = now - USAGE_HOURLY_DAYS * 86400
+    day_cutoff = now - USAGE_RETENTION_DAYS * 86400
+    changed = False
+    for start in [s for s in rollup["hours"] if int(s) < hour_cutoff]:
+        day = rollup["days"].setdefault(str(int(start) // 86400 * 86400), {})
+        for service_id, clicks in rollup["hours"].pop(start).items():
+            day[service_id] = day.get(service_id, 0) + clicks
+        changed = True
+    for start in [s for s in rollup["days"] if int(s) + 86400 <= day_cutoff]:
+        del rollup["days"][start]
+        changed = True
+    return changed
+
+
+def hourly_counts(clicks):
+    """{hour start: {service id: clicks}} of (service id, hour) clicks"""
+    hours = {}
+    for service_id, hour in clicks:
+        counts = hours.setdefault(str(hour), {})
+        counts[service_id] = counts.get(service_id, 0) + 1
+    return hours
+
+
+def merge_hourly_counts(rollup, hours):
+    """Add hourly counts into a rollup's hours"""
+    for hour, counts in hours.items():
+        merged = rollup["hours"].setdefault(hour, {})
+        for service_id, count in counts.items():
+            merged[service_id] = merged.get(service_id, 0) + count
+
+
+def flush_usage():
+    """Merge the pending clicks into USAGE_FILE and compact it
+
+    If the file cannot be read or written, the clicks go back to the
+    front of the queue for the next flush.
+    """
+    with _usage_flush_lock:
+        clicks = []
+        while _usage_clicks:
+            clicks.append(_usage_clicks.popleft())
+        hours = hourly_counts(clicks)
+
+        try:
+            with usage_file_lock():
+                rollup = read_usage_file()
+                merge_hourly_counts(rollup, hours)
+                if compact_usage(rollup, time.time()) or hours:
+                    with open(f"{USAGE_FILE}.tmp", "wb") as f:
+                        f.write(compact_json_bytes(rollup))
+                    os.replace(f"{USAGE_FILE}.tmp", USAGE_FILE)
+        except OSError:
+            _usage_clicks.extendleft(reversed(clicks))
+            raise
+
+
+def usage_totals(period):
+    """Clicks per service id over the last period, pending clicks included
+
+    Reads the rollup as last flushed and adds the pending clicks, leaving
+    writes and compaction to the periodic flush.
+    """
+    with _usage_flush_lock:
+        rollup = read_usage_file()
+        pending = list(_usage_clicks)
+    merge_hourly_counts(rollup, hourly_counts(pending))
+    since = time.time() - USAGE_PERIODS[period]
+    totals = {}
+    for section, length in (("hours", 3600), ("days", 86400)):
+        for start, counts in rollup[section].items():
+            if int(start) + length > since:
+                for service_id, clicks in counts.items():
+                    totals[service_id] = totals.get(service_id, 0) + clicks
+    return totals
+
+
+def sort_services_by_usage(services, totals):
+    """Services with the counted tiles of each column reordered by clicks
+
+    Other tiles keep their places; tiles with equal clicks keep their order.
+    """
+    services = list(services)
+    columns = {}
+    for position, service in enumerate(services):
+        if service.get("type") in USAGE_TILE_TYPES:
+            columns.setdefault(service.get("column", 0), []).append(position)
+    for positions in columns.values():
+        tiles = sorted(
+            (services[p] for p in positions),
+            key=lambda service: -totals.get(str(service["id"]), 0),
+        )
+        for position, service in zip(positions, tiles):
+            services[position] = service
+    return services
+
+
+def apply_usage_sort(period):
+    """Re-sort the tiles by clicks over period; True if the order changed"""
+    totals = usage_totals(period)
+    with _services_lock:
+        services = load_services()
+        ordered = sort_services_by_usage(services, totals)
+        if [s["id"] for s in ordered] == [s["id"] for s in services]:
+            return False
+        if not save_services(ordered):
+            raise OSError("Could not save the services")
+    return True
+
+
+def run_usage_flusher(stop):
+    """Flush clicks periodically until stop is set"""
+    while not stop.wait(USAGE_FLUSH_INTERVAL):
+        try:
+            flush_usage()
+            if USAGE_AUTO_SORT:
+                apply_usage_sort(USAGE_AUTO_SORT)
+        except Exception:
+            logger.exception("Flushing usage counts failed")
+
+
+def start_usage_flusher():
+    """Start the background usage flush thread"""
+    global _usage_flusher
+    if _usage_flusher is not None:
+        return
+    _usage_flusher_stop.clear()
+    _usage_flusher = threading.Thread(
+        target=run_usage_flusher,
+        args=(_usage_flusher_stop,),
+        name="usage-flusher",
+        daemon=True,
+    )
+    _usage_flusher.start()
+
+
+def stop_usage_flusher():
+    """Stop the flush thread and write out the clicks still pending"""
+    global _usage_flusher
+    if _usage_flusher is None:
+        return
+    _usage_flusher_stop.set()
+    _usage_flusher.join(timeout=5)
+    _usage_flusher = None
+    try:
+        flush_usage()
+    except OSError:
+        logger.exception("Flushing usage counts failed")
+
+
+atexit.register(stop_usage_flusher)
+
+
+@app.route("/api/usage/click", methods=["POST"])
+def record_click():
+    """Count a tile click; sent with navigator.sendBeacon"""
+    try:
+        data = read_json_body(USAGE_BEACON_MAX_BYTES)
+    except RequestBodyError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    service_id = str(data.get("id")) if isinstance(data, dict) else None
+    if service_id not in usage_target_ids():
+        return jsonify({"success": False, "error": "Unknown tile"}), 400
+    _usage_clicks.append((service_id, int(time.time()) // 3600 * 3600))
+    return "", 204
+
+
+@app.route("/api/admin/usage", methods=["GET"])
+def get_usage():
+    """Most clicked tiles over ?period=day|week|month - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    period = request.args.get("period", "week")
+    if period not in USAGE_PERIODS:
+        return jsonify({"success": False, "error": "Unknown period"}), 400
+    limit = max(1, min(request.args.get("limit", 20, type=int), 200))
+    try:
+        totals = usage_totals(period)
+    except OSError as e:
+        return error_response(e)
+    tiles = [
+        {
+            "id": service["id"],
+            "name": service.get("name", ""),
+            "type": service.get("type"),
+            "column": service.get("column", 0),
+            "clicks": totals.get(str(service["id"]), 0),
+        }
+        for service in get_store("services")
+        if service.get("type") in USAGE_TILE_TYPES
+    ]
+    tiles.sort(key=lambda tile: -tile["clicks"])
+    return jsonify({"success": True, "period": period, "services": tiles[:limit]})
+
+
+@app.route("/api/admin/usage/sort", methods=["POST"])
+def sort_by_usage():
+    """Reorder the tiles of each column by clicks over a period - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    try:
+        data = read_json_body(USAGE_BEACON_MAX_BYTES)
+    except RequestBodyError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    period = data.get("period", "week") if isinstance(data, dict) else None
+    if period not in USAGE_PERIODS:
+        return jsonify({"success": False, "error": "Unknown period"}), 400
+    try:
+        changed = apply_usage_sort(period)
+    except OSError as e:
+        return error_response(e)
+    return jsonify({"success": True, "changed": changed})
+
+
 # CORS support for development
 @app.after_request
 def after_request(response):
@@ -792,6 +4554,16 @@ def favicon_svg():
     return send_from_directory("static", "favicon.svg", mimetype="image/svg+xml")
 
 
+@app.route("/sw.js")
+def service_worker():
+    from flask import send_from_directory
+
+    # Served from the root so the worker's scope covers the whole dashboard
+    response = send_from_directory("static", "sw.js", mimetype="text/javascript")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 @app.route("/favicon.ico")
 def favicon_ico():
     from flask import send_from_directory
@@ -799,23 +4571,1054 @@ def favicon_ico():
     return send_from_directory("static", "favicon.svg", mimetype="image/svg+xml")
 
 
-if __name__ == "__main__":
-    # Ensure the services config file exists with default structure
+# Snapshots
+#
+# A snapshot holds every store file in one compressed binary file, for
+# backups and moving an install. Layout: the magic bytes and a format
+# version, then a zlib stream of records. Each record is a kind byte, a
+# name, a length, the SHA-256 of its data and the data itself: first a
+# JSON manifest, then one record per store file (JSON files re-encoded
+# compactly), then an end record whose digest covers all file digests.
+# Imports are parsed as they stream in and verified and validated in
+# full before any store file is replaced.
+SNAPSHOT_MAGIC = b"HOMELYSN"
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct(">8sH")
+SNAPSHOT_RECORD = struct.Struct(">BHQ32s")  # kind, name length, data length, digest
+SNAPSHOT_MANIFEST, SNAPSHOT_FILE, SNAPSHOT_END = 1, 2, 3
+SNAPSHOT_COMPRESSION_LEVEL = 6
+SNAPSHOT_MAX_BYTES = 256 * 1024 * 1024  # Uncompressed size an import may reach
+SNAPSHOT_CHUNK_SIZE = 64 * 1024
+_snapshot_lock = threading.Lock()  # One import at a time
+
+
+class SnapshotError(ValueError):
+    """A snapshot is damaged, incomplete, invalid or of an unknown format"""
+
+
+def _snapshot_record(kind, name, data):
+    encoded_name = name.encode("utf-8")
+    digest = hashlib.sha256(data).digest()
+    return SNAPSHOT_RECORD.pack(kind, len(encoded_name), len(data), digest) + (
+        encoded_name + data
+    )
+
+
+def collect_snapshot_files():
+    """Current contents of every store file, as {store: {path: bytes}}"""
+    stores = {}
+    for store, (paths, *_) in get_store_specs().items():
+        files = {}
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                raw = f.read()
+            if path.endswith(".json") and raw.strip():
+                raw = compact_json_bytes(parse_json_bytes(raw))
+            files[path] = raw
+        stores[store] = files
+    return stores
+
+
+def iter_snapshot(stores):
+    """Encode collected store files as a stream of snapshot chunks"""
+    yield SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION)
+    compressor = zlib.compressobj(SNAPSHOT_COMPRESSION_LEVEL)
+    manifest = {
+        "created_at": datetime.now().isoformat(),
+        "worker_id": WORKER_ID,
+        "stores": {store: sorted(files) for store, files in stores.items()},
+    }
+    yield compressor.compress(
+        _snapshot_record(SNAPSHOT_MANIFEST, "manifest", compact_json_bytes(manifest))
+    )
+    digests = hashlib.sha256()
+    for store, files in stores.items():
+        for path, raw in files.items():
+            record = _snapshot_record(SNAPSHOT_FILE, f"{store}/{path}", raw)
+            digests.update(record[SNAPSHOT_RECORD.size - 32 : SNAPSHOT_RECORD.size])
+            yield compressor.compress(record)
+    end = SNAPSHOT_RECORD.pack(SNAPSHOT_END, 0, 0, digests.digest())
+    yield compressor.compress(end) + compressor.flush()
+
+
+def read_snapshot(chunks):
+    """Decode and verify a snapshot arriving as an iterable of byte chunks
+
+    Returns (manifest, {store: {path: bytes}}). Raises SnapshotError for
+    anything but a complete, undamaged snapshot of known store files.
+    """
+    specs = get_store_specs()
+    header = b""
+    decompressor = zlib.decompressobj()
+    buffer = bytearray()
+    received = 0
+    manifest = None
+    stores = {}
+    digests = hashlib.sha256()
+    ended = False
+
+    def take_records():
+        nonlocal manifest, ended
+        while len(buffer) >= SNAPSHOT_RECORD.size:
+            kind, name_length, size, digest = SNAPSHOT_RECORD.unpack_from(buffer)
+            end = SNAPSHOT_RECORD.size + name_length + size
+            if len(buffer) < end:
+                return
+            name = bytes(
+                buffer[SNAPSHOT_RECORD.size : SNAPSHOT_RECORD.size + name_length]
+            )
+            data = bytes(buffer[SNAPSHOT_RECORD.size + name_length : end])
+            del buffer[:end]
+            if ended:
+                raise SnapshotError("data after the end record")
+            if kind == SNAPSHOT_END:
+                if digest != digests.digest():
+                    raise SnapshotError("file list does not match the end record")
+                ended = True
+                continue
+            if hashlib.sha256(data).digest() != digest:
+                raise SnapshotError(f"{name.decode('utf-8', 'replace')} is corrupted")
+            if kind == SNAPSHOT_MANIFEST and manifest is None:
+                try:
+                    manifest = parse_json_bytes(data)
+                except ValueError as e:
+                    raise SnapshotError(f"manifest is not valid JSON: {e}") from e
+                if not isinstance(manifest, dict) or not isinstance(
+                    manifest.get("stores", {}), dict
+                ):
+                    raise SnapshotError("manifest is not a snapshot manifest")
+            elif kind == SNAPSHOT_FILE and manifest is not None:
+                store, _, path = name.decode("utf-8", "replace").partition("/")
+                if store not in specs or path not in specs[store][0]:
+                    raise SnapshotError(f"unknown store file {store}/{path}")
+                stores.setdefault(store, {})[path] = data
+                digests.update(digest)
+            else:
+                raise SnapshotError(f"unexpected record of kind {kind}")
+
+    for chunk in chunks:
+        if len(header) < SNAPSHOT_HEADER.size:
+            missing = SNAPSHOT_HEADER.size - len(header)
+            header, chunk = header + chunk[:missing], chunk[missing:]
+            if len(header) < SNAPSHOT_HEADER.size:
+                continue
+            magic, version = SNAPSHOT_HEADER.unpack(header)
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError("not a Homely snapshot")
+            if version != SNAPSHOT_FORMAT_VERSION:
+                raise SnapshotError(f"unsupported snapshot format version {version}")
+        try:
+            data = decompressor.decompress(chunk, SNAPSHOT_MAX_BYTES - received + 1)
+        except zlib.error as e:
+            raise SnapshotError(f"damaged compressed data: {e}") from e
+        received += len(data)
+        if received > SNAPSHOT_MAX_BYTES:
+            raise SnapshotError("snapshot is too large")
+        buffer += data
+        take_records()
+
+    if manifest is None or not ended or not decompressor.eof or buffer:
+        raise SnapshotError("snapshot is incomplete")
+    for store in manifest.get("stores", {}):
+        if store not in specs:
+            raise SnapshotError(f"manifest lists an unknown store {store}")
+        stores.setdefault(store, {})
+    return manifest, stores
+
+
+def check_snapshot_stores(stores):
+    """Validation errors of the JSON store files in a decoded snapshot"""
+    errors = []
+    for store, files in stores.items():
+        for path, raw in files.items():
+            if not path.endswith(".json") or not raw.strip():
+                continue
+            try:
+                data = parse_json_bytes(raw)
+            except ValueError as e:
+                errors.append(f"{path}: {e}")
+                continue
+            expected = STORE_FILE_TYPES.get(store)
+            if expected and not isinstance(data, expected):
+                errors.append(f"{path}: expected a JSON {expected.__name__}")
+            elif store == "services":
+                errors += [
+                    f"{path}: {e}"
+                    for e in check_services_store(normalize_services(data))
+                ]
+            elif store == "calendar_config":
+                errors += [f"{path}: {e}" for e in check_calendar_config_store(data)]
+            elif store == "visibility_profiles":
+                errors += [
+                    f"{path}: {e}"
+                    for e in check_visibility_profiles_store(data.get("profiles", {}))
+                ]
+    return errors[:MAX_VALIDATION_ERRORS]
+
+
+def _write_file_atomically(path, raw):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(raw)
+    os.replace(temp_path, path)
+
+
+def restore_snapshot(chunks):
+    """Verify, validate and then swap in a snapshot; returns its manifest
+
+    Stores the snapshot contains are replaced as a whole (files missing
+    from it are removed); the services file is backed up first.
+    """
+    with _snapshot_lock:
+        manifest, stores = read_snapshot(chunks)
+        errors = check_snapshot_stores(stores)
+        if errors:
+            raise SnapshotError("; ".join(errors))
+
+        specs = get_store_specs()
+        # Held so no read-modify-write endpoint saves over the restore
+        with _services_lock, _suggestions_lock, _notes_lock, _calendar_lock:
+            backup_services_file()
+            for store, files in stores.items():
+                for path in specs[store][0]:
+                    raw = files.get(path)
+                    if raw is None:
+                        if os.path.exists(path):
+                            os.remove(path)
+                    elif path.endswith(".json") and raw.strip():
+                        write_json_file(store, path, parse_json_bytes(raw))
+                    else:
+                        _write_file_atomically(path, raw)
+            for store in stores:
+                reload_store(store, force=True)
+    logger.info(
+        "Restored snapshot from %s (%s)",
+        manifest.get("created_at"),
+        ", ".join(sorted(stores)),
+    )
+    return manifest
+
+
+def restore_snapshot_file(path):
+    """Restore the stores from a snapshot file"""
+    with open(path, "rb") as f:
+        return restore_snapshot(iter(lambda: f.read(SNAPSHOT_CHUNK_SIZE), b""))
+
+
+@app.route("/api/snapshot", methods=["GET"])
+def export_snapshot():
+    """Download every store as one compressed snapshot - admin only"""
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    try:
+        stores = collect_snapshot_files()
+        name = f"homely-{datetime.now().strftime('%Y%m%d_%H%M%S')}.hsnap"
+        return Response(
+            iter_snapshot(stores),
+            mimetype="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{name}"'},
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.route("/api/snapshot", methods=["POST"])
+def import_snapshot():
+    """Replace the stores with those of an uploaded snapshot - admin only
+
+    The request body is the snapshot file itself.
+    """
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    try:
+        stream = request.stream
+        manifest = restore_snapshot(iter(lambda: stream.read(SNAPSHOT_CHUNK_SIZE), b""))
+        return jsonify(
+            {
+                "success": True,
+                "created_at": manifest.get("created_at"),
+                "stores": sorted(manifest.get("stores", {})),
+            }
+        )
+    except SnapshotError as e:
+        return jsonify({"success": False, "error": f"Snapshot rejected: {e}"}), 400
+    except Exception as e:
+        return error_response(e)
+
+
+# Bulk import
+#
+# Tiles and quotes can be imported in bulk from JSON, JSON Lines, CSV or
+# YAML uploads: Homely exports, plain lists, Homer configs (groups of
+# items) and Heimdall exports; quotes also from plain text, one per line.
+# CSV, JSON Lines and text are parsed line by line as the upload streams
+# in; JSON and YAML documents are read whole (up to IMPORT_MAX_BYTES).
+# Rows are mapped and validated one by one as they are parsed, each bad row
+# is reported by number, duplicates (same URL, or same type and name; same
+# quote text) are skipped, and everything valid is committed in one atomic
+# write with one backup.
+IMPORT_MAX_BYTES = 16 * 1024 * 1024
+IMPORT_CHUNK_SIZE = 64 * 1024
+IMPORT_MAX_ERRORS = 200  # Row errors reported; the rest are only counted
+IMPORT_FORMATS = ("json", "jsonl", "csv", "yaml", "text")
+URL_SCHEME_PATTERN = re.compile(r"^[a-z][a-z0-9+.-]*://", re.IGNORECASE)
+
+
+class ImportFormatError(ValueError):
+    """The upload cannot be read as the requested format"""
+
+
+def iter_upload_lines():
+    """Lines of the request body, decoded as they stream in"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    received = 0
+    pending = ""
+    try:
+        while True:
+            chunk = request.stream.read(IMPORT_CHUNK_SIZE)
+            received += len(chunk)
+            if received > IMPORT_MAX_BYTES:
+                raise RequestBodyError(f"Upload exceeds {IMPORT_MAX_BYTES} bytes", 413)
+            pending += decoder.decode(chunk, final=not chunk)
+            lines = pending.splitlines(keepends=True)
+            if chunk and lines and not lines[-1].endswith(("\n", "\r")):
+                pending = lines.pop()
+            else:
+                pending = ""
+            yield from lines
+            if not chunk:
+                return
+    except UnicodeDecodeError:
+        raise ImportFormatError("Upload is not UTF-8 text")
+
+
+def parse_upload_document(fmt):
+    """The whole upload parsed as one JSON or YAML document"""
+    text = "".join(iter_upload_lines())
+    if fmt == "json":
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            raise ImportFormatError(f"Invalid JSON: {e}")
+    try:
+        import yaml
+    except ImportError:
+        raise ImportFormatError("YAML imports need PyYAML (pip install pyyaml)")
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    try:
+        return yaml.load(text, Loader=loader)
+    except yaml.YAMLError as e:
+        raise ImportFormatError(f"Invalid YAML: {e}")
+
+
+def iter_upload_rows(fmt, list_keys):
+    """Raw rows of the upload, streamed where the format allows it
+
+    A JSON or YAML document may be a list or an object holding the list
+    under one of list_keys.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(iter_upload_lines())
+        for row in reader:
+            yield {
+                (key or "").strip().lower(): value.strip()
+                for key, value in row.items()
+                if isinstance(value, str) and value.strip()
+            }
+    elif fmt == "jsonl":
+        for number, line in enumerate(iter_upload_lines(), 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ImportFormatError(f"Line {number} is not JSON: {e}")
+    elif fmt == "text":
+        for line in iter_upload_lines():
+            if line.strip():
+                yield line.strip()
+    else:
+        document = parse_upload_document(fmt)
+        if isinstance(document, dict):
+            document = next(
+                (document[key] for key in list_keys if key in document), None
+            )
+        if not isinstance(document, list):
+            raise ImportFormatError(
+                f"Expected a list, or an object with {' or '.join(list_keys)}"
+            )
+        yield from document
+
+
+def expand_homer_groups(rows):
+    """Rows with Homer groups ({"name", "items": [...]}) replaced by their items
+
+    Each group's tiles go to the next column in turn.
+    """
+    groups = 0
+    for row in rows:
+        if isinstance(row, dict) and isinstance(row.get("items"), list):
+            for item in row["items"]:
+                if isinstance(item, dict):
+                    yield dict(item, column=item.get("column", groups % 3))
+                else:
+                    yield item
+            groups += 1
+        else:
+            yield row
+
+
+def map_import_service(row, keep_ids):
+    """A Homely service from an imported row (Homely, Homer or Heimdall)"""
+    if not isinstance(row, dict):
+        return row  # Rejected by validation
+    if "type" in row and row["type"] != "url":
+        service = dict(row)
+    else:
+        service = {
+            "type": "url",
+            "name": row.get("name") or row.get("title"),
+            "url": row.get("url") or row.get("link"),
+            "description": row.get("description")
+            or row.get("subtitle")
+            or row.get("appdescription")
+            or "",
+        }
+        for field in ("column", "id"):
+            if field in row:
+                service[field] = row[field]
+        # Only Font Awesome classes; Homer logos and Heimdall icons are files
+        icon = row.get("icon")
+        if isinstance(icon, str) and icon.startswith("fa"):
+            service["icon"] = icon
+        service = {key: value for key, value in service.items() if value is not None}
+    if not keep_ids:
+        service.pop("id", None)
+    return service
+
+
+def service_dedupe_key(service):
+    """Services with the same key are duplicates: same URL, or type and name"""
+    url = service.get("url")
+    if isinstance(url, str) and url.strip():
+        url = URL_SCHEME_PATTERN.sub("", url.strip()).rstrip("/")
+        host, _, rest = url.partition("/")
+        return ("url", host.lower(), rest)
+    return ("name", service.get("type"), str(service.get("name", "")).casefold())
+
+
+def quote_dedupe_key(quote):
+    """Quotes with the same text, ignoring case and spacing, are duplicates"""
+    return " ".join(quote["text"].split()).casefold()
+
+
+def map_import_quote(row):
+    """A quote {"text", "author"} from an imported row"""
+    if isinstance(row, str):
+        return {"text": row}
+    if isinstance(row, dict):
+        quote = {"text": row.get("text") or row.get("quote")}
+        if row.get("author"):
+            quote["author"] = row["author"]
+        return quote
+    return row  # Rejected by validation
+
+
+def validate_import_rows(rows, mapper, validator, dedupe_key, report):
+    """Mapped and validated rows, with duplicates within the upload skipped
+
+    Errors and duplicate counts are added to report.
+    """
+    accepted = {}
+    for number, row in enumerate(rows, 1):
+        errors = []
+        item = validator(mapper(row), (f"Row {number}",), errors)
+        report["rows"] += 1
+        if errors:
+            report["error_count"] += 1
+            if len(report["errors"]) < IMPORT_MAX_ERRORS:
+                report["errors"].extend(errors[:3])
+            continue
+        key = dedupe_key(item)
+        if key in accepted:
+            report["duplicates"] += 1
+        else:
+            accepted[key] = item
+    return accepted
+
+
+def validate_import_service(service, path, errors):
+    """Validate one imported service against the schema of its type"""
+    validator = service_validator(service, path, errors)
+    if validator is None:
+        return service
+    service.setdefault("type", "url")
+    return validator(service, path, errors)
+
+
+def read_import_options():
+    """(format, replace, dry_run) from the query string"""
+    fmt = request.args.get("format", "json")
+    if fmt == "yml":
+        fmt = "yaml"
+    if fmt not in IMPORT_FORMATS:
+        raise ImportFormatError(f"format must be one of {', '.join(IMPORT_FORMATS)}")
+    mode = request.args.get("mode", "merge")
+    if mode not in ("merge", "replace"):
+        raise ImportFormatError("mode must be merge or replace")
+    return fmt, mode == "replace", request.args.get("dry_run") == "1"
+
+
+def new_import_report(dry_run):
+    return {
+        "success": True,
+        "dry_run": dry_run,
+        "rows": 0,
+        "imported": 0,
+        "duplicates": 0,
+        "error_count": 0,
+        "errors": [],
+    }
+
+
+@app.route("/api/admin/import/services", methods=["POST"])
+def import_services():
+    """Bulk import tiles - admin only
+
+    ?format=json|jsonl|csv|yaml, ?mode=merge (add to the tiles, the default)
+    or replace, ?dry_run=1 to only validate.
+    """
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    try:
+        fmt, replace, dry_run = read_import_options()
+        if fmt == "text":
+            raise ImportFormatError("Tiles cannot be imported from plain text")
+        report = new_import_report(dry_run)
+        rows = expand_homer_groups(iter_upload_rows(fmt, ("services", "items")))
+        accepted = validate_import_rows(
+            rows,
+            lambda row: map_import_service(row, keep_ids=replace),
+            validate_import_service,
+            service_dedupe_key,
+            report,
+        )
+    except ImportFormatError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except RequestBodyError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+
+    try:
+        with _services_lock:
+            existing = [] if replace else load_services()
+            known = {service_dedupe_key(s) for s in existing}
+            ids = {s["id"] for s in existing}
+            imported = []
+            for key, service in accepted.items():
+                if key in known:
+                    report["duplicates"] += 1
+                    continue
+                if service.get("id") in ids:
+                    service["id"] = new_service_id()
+                service.setdefault("id", new_service_id())
+                ids.add(service["id"])
+                imported.append(service)
+            services = existing + imported
+            if len(services) > MAX_SERVICES:
+                return jsonify(
+                    {
+                        "success": False,
+                        "error": f"The dashboard allows at most {MAX_SERVICES} tiles, "
+                        f"this import would make {len(services)}",
+                    }
+                ), 400
+            report["imported"] = len(imported)
+            unchanged = dry_run or not (imported or replace)
+            if not unchanged and not (sync_notes(services) and save_services(services)):
+                return jsonify(
+                    {"success": False, "error": "Failed to save services"}
+                ), 500
+    except Exception as e:
+        return error_response(e)
+    return jsonify(report)
+
+
+@app.route("/api/admin/import/quotes", methods=["POST"])
+def import_quotes():
+    """Bulk import quotes - admin only
+
+    ?format=json|jsonl|csv|yaml|text, ?mode=merge (the default) or
+    replace, ?dry_run=1 to only validate.
+    """
+    if not check_admin_auth():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    try:
+        fmt, replace, dry_run = read_import_options()
+        report = new_import_report(dry_run)
+        accepted = validate_import_rows(
+            iter_upload_rows(fmt, ("quotes",)),
+            map_import_quote,
+            validate_new_quote,
+            quote_dedupe_key,
+            report,
+        )
+    except ImportFormatError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except RequestBodyError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+
+    def merge(config):
+        """Add the accepted quotes to config, counting what was imported"""
+        existing = [] if replace else config.get("quotes", [])
+        known = {quote_dedupe_key(quote) for quote in existing}
+        imported = [quote for key, quote in accepted.items() if key not in known]
+        report["duplicates"] += len(accepted) - len(imported)
+        report["imported"] = len(imported)
+        config["quotes"] = existing + imported
+
+    try:
+        if dry_run:
+            config = load_calendar_config()
+            merge(config)
+            errors = []
+            validate_calendar_config(config, ("config",), errors)
+            if errors:
+                return validation_error_response(errors[:MAX_VALIDATION_ERRORS])
+            return jsonify(report)
+        result = update_calendar_resource("quotes", None, merge)
+    except Exception as e:
+        return error_response(e)
+    if isinstance(result, tuple):  # Failed validation or saving
+        return result
+    report["version"] = result.get_json()["version"]
+    return jsonify(report)
+
+
+# ASGI serving mode
+#
+# AsgiApp serves the Flask routes unchanged, each request run on a small
+# thread pool with both bodies streamed through a chunk at a time, next to
+# natively async streaming endpoints. An idle stream is a coroutine and a
+# queue rather than a thread, so panels can stay connected.
+# Run it with --server asgi, or any ASGI server through the factory
+# (uvicorn --factory app:create_asgi_app).
+# asyncio is only imported once a request arrives this way.
+ASGI_WSGI_THREADS = 16  # Threads running regular Flask requests
+ASGI_MAX_BODY_BYTES = 16 * 1024 * 1024
+STREAM_KEEPALIVE = 25  # Seconds between keep-alive comments on idle streams
+STREAM_QUEUE_SIZE = 32  # Pending events per stream before the oldest are dropped
+_stream_subscribers = set()  # (event loop, asyncio.Queue) per open stream
+
+
+def _offer_stream_event(events, event):
+    """Queue an event for one stream, dropping its oldest if it is behind"""
+    if events.full():
+        events.get_nowait()
+    events.put_nowait(event)
+
+
+def publish_stream_event(store):
+    """Store change listener: tell every open stream which store changed"""
+    event = {
+        "type": "store",
+        "store": store,
+        "version": store_version(store),
+        "revision": current_revision(),
+    }
+    for loop, events in list(_stream_subscribers):
+        loop.call_soon_threadsafe(_offer_stream_event, events, event)
+
+
+on_store_change(publish_stream_event)
+
+
+def build_wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope, reading the request from body"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = name
+        else:
+            key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    if "CONTENT_LENGTH" not in environ:
+        environ["wsgi.input_terminated"] = True  # Chunked; body ends itself
+    return environ
+
+
+def request_content_length(scope):
+    """Content-Length of an ASGI HTTP scope, or None if it has none"""
+    for name, value in scope.get("headers", []):
+        if name.lower() == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class AsgiRequestBody(io.RawIOBase):
+    """wsgi.input reading an ASGI request body as it arrives
+
+    Read on a worker thread; each chunk is received on the event loop, so
+    a streaming upload is handled while it is still being sent.
+    """
+
+    def __init__(self, receive, loop, limit):
+        super().__init__()
+        self._receive = receive
+        self._loop = loop
+        self._limit = limit
+        self._buffer = bytearray()
+        self._received = 0
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        import asyncio
+
+        message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+        if message["type"] == "http.disconnect":
+            self._more = False
+            raise ClientDisconnected()
+        body = message.get("body", b"")
+        self._received += len(body)
+        if self._received > self._limit:
+            self._more = False
+            raise RequestEntityTooLarge()
+        self._buffer += body
+        self._more = message.get("more_body", False)
+
+    def _take(self, size):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            while self._more:
+                self._fill()
+            return self._take(len(self._buffer))
+        while self._more and len(self._buffer) < size:
+            self._fill()
+        return self._take(size)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def readline(self, size=-1):
+        while self._more and b"\n" not in self._buffer:
+            if 0 <= size <= len(self._buffer):
+                break
+            self._fill()
+        end = self._buffer.find(b"\n") + 1 or len(self._buffer)
+        if size is not None and size >= 0:
+            end = min(end, size)
+        return self._take(end)
+
+
+class WsgiResponse:
+    """A WSGI app's response, pulled a chunk at a time on a worker thread"""
+
+    def __init__(self, wsgi_app, environ):
+        self.status = None
+        self.headers = []
+        self._pending = []  # Written through the write() callable
+        self._result = wsgi_app(environ, self._start_response)
+        self._chunks = iter(self._result)
+
+    def _start_response(self, status, headers, exc_info=None):
+        self.status = int(status.split(" ", 1)[0])
+        self.headers = headers
+        return self._pending.append
+
+    def next_chunk(self):
+        """The next piece of the body, or None once the body is complete"""
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return None
+            self._pending.append(chunk)
+        chunk = b"".join(self._pending)
+        self._pending.clear()
+        return chunk
+
+    def close(self):
+        if hasattr(self._result, "close"):
+            self._result.close()
+
+
+class AsgiApp:
+    """ASGI application: async streaming endpoints plus the Flask routes"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(
+            max_workers=ASGI_WSGI_THREADS, thread_name_prefix="wsgi"
+        )
+        self.streams = {"/api/stream": self.stream_events}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            handler = self.streams.get(scope["path"], self.call_wsgi)
+            await handler(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await send({"type": "websocket.close"})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def call_wsgi(self, scope, receive, send):
+        """Run a Flask request on the pool, streaming both bodies through"""
+        import asyncio
+
+        length = request_content_length(scope)
+        if length is not None and length > ASGI_MAX_BODY_BYTES:
+            await self.send_simple(send, 413, b"Request body too large")
+            return
+
+        loop = asyncio.get_running_loop()
+        body = AsgiRequestBody(receive, loop, ASGI_MAX_BODY_BYTES)
+        environ = build_wsgi_environ(scope, body)
+        response = await loop.run_in_executor(
+            self.executor, WsgiResponse, self.wsgi_app, environ
+        )
+        try:
+            chunk = await loop.run_in_executor(self.executor, response.next_chunk)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response.status,
+                    "headers": [
+                        (name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in response.headers
+                    ],
+                }
+            )
+            while chunk is not None:
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+                chunk = await loop.run_in_executor(self.executor, response.next_chunk)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            await loop.run_in_executor(self.executor, response.close)
+
+    async def send_simple(self, send, status, text):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            }
+        )
+        await send({"type": "http.response.body", "body": text})
+
+    async def stream_events(self, scope, receive, send):
+        """Server-sent events: one "store" event per store change"""
+        import asyncio
+
+        if scope["method"] != "GET":
+            await self.send_simple(send, 405, b"Method not allowed")
+            return
+
+        events = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        subscriber = (asyncio.get_running_loop(), events)
+
+        async def wait_for_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        disconnected = asyncio.ensure_future(wait_for_disconnect())
+        _stream_subscribers.add(subscriber)
+        try:
+            with track_connection("stream"):
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 200,
+                        "headers": [
+                            (b"content-type", b"text/event-stream"),
+                            (b"cache-control", b"no-cache"),
+                            (b"x-accel-buffering", b"no"),
+                        ],
+                    }
+                )
+                chunk = b"retry: 5000\n\n"
+                while True:
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+                    next_event = asyncio.ensure_future(events.get())
+                    done, _ = await asyncio.wait(
+                        {next_event, disconnected},
+                        timeout=STREAM_KEEPALIVE,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if disconnected in done:
+                        next_event.cancel()
+                        break
+                    if next_event in done:
+                        event = next_event.result()
+                        chunk = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                        chunk = chunk.encode("utf-8")
+                    else:
+                        next_event.cancel()
+                        chunk = b": keep-alive\n\n"
+        finally:
+            _stream_subscribers.discard(subscriber)
+            disconnected.cancel()
+
+
+# Startup
+#
+# Whatever a first request would otherwise wait for is done before the
+# server accepts traffic: stores are loaded and validated, templates are
+# compiled (through a bytecode cache that survives restarts) and the
+# default services payload is prepared. Heavy optional modules (requests,
+# asyncio, XML parsing, PyYAML, sqlite3) are imported where they are first
+# used. Importing this module starts nothing: python app.py, or the
+# create_app / create_asgi_app factories, call start_app once.
+TEMPLATE_CACHE_DIR = ".template_cache"
+PRECOMPILED_TEMPLATES = ("index.html", "admin_login.html")
+_startup = {"ready": False, "total_ms": None, "phases": {}}
+
+
+@contextmanager
+def startup_phase(name):
+    """Time one step of start_app"""
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        _startup["phases"][name] = round((time.perf_counter() - began) * 1000, 1)
+
+
+def enable_template_cache(directory=TEMPLATE_CACHE_DIR):
+    """Keep compiled templates on disk, so restarts skip the Jinja compile"""
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        logger.warning("Template cache disabled, cannot create %s: %s", directory, e)
+        return
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def precompile_templates():
+    """Compile the page templates now rather than on their first request"""
+    for name in PRECOMPILED_TEMPLATES:
+        app.jinja_env.get_template(name)
+
+
+def warm_caches():
+    """Build the caches the first dashboard load would otherwise fill"""
+    get_search_index(get_store("services"), services_etag())
+    calendar_resource_versions()
+    prime_change_feed()
+
+
+def prepare_data_files():
+    """Create the services file if missing and warn about a missing calendar"""
     if not os.path.exists(CONFIG_FILE):
         save_services(DEFAULT_SERVICES)
 
-    # Check if calendar config exists - if not, user needs to create it or copy the provided one
+    # Users create the calendar config or copy the provided one
     if not os.path.exists(CALENDAR_CONFIG_FILE):
-        print(
-            f"Warning: Calendar configuration file '{CALENDAR_CONFIG_FILE}' not found!"
-        )
-        print(
-            f"Please create this file or copy from the provided calendar_config.json template."
-        )
-        print(
-            "The application will still work, but calendar and quote features will be limited."
+        logger.warning(
+            "Calendar configuration file '%s' not found! Please create this file or "
+            "copy from the provided calendar_config.json template. The application "
+            "will still work, but calendar and quote features will be limited.",
+            CALENDAR_CONFIG_FILE,
         )
 
+
+def start_app(log_level=LOG_LEVEL, log_file=LOG_FILE, configure=None):
+    """Load, validate and warm up everything before serving, and log the timings
+
+    configure, if given, is called once logging is set up and before any
+    store is warmed, to apply options that change what is served (e.g. a
+    snapshot to restore).
+    """
+    if _startup["ready"]:
+        return
+    began = time.perf_counter()
+    # Interpreter start-up and module imports, measured as CPU time
+    _startup["phases"]["imports"] = round(time.process_time() * 1000, 1)
+    with startup_phase("logging"):
+        configure_logging(log_level, log_file)
+    with startup_phase("configuration"):
+        prepare_data_files()
+        if configure is not None:
+            configure()
+    with startup_phase("notes_migration"):
+        migrate_legacy_notes()
+    with startup_phase("stores"):
+        start_store_watcher()
+        run_deep_health_check(force=True)
+    with startup_phase("templates"):
+        enable_template_cache()
+        precompile_templates()
+    with startup_phase("caches"):
+        warm_caches()
+    start_usage_flusher()
+    _startup["total_ms"] = round((time.perf_counter() - began) * 1000, 1)
+    _startup["ready"] = True
+    logger.info(
+        "Ready in %.1f ms (%s)",
+        _startup["total_ms"],
+        ", ".join(f"{name} {ms} ms" for name, ms in _startup["phases"].items()),
+        extra={"startup": _startup["phases"]},
+    )
+
+
+def create_app():
+    """WSGI entry point for other servers, e.g. gunicorn 'app:create_app()'"""
+    start_app()
+    return app
+
+
+def create_asgi_app():
+    """ASGI entry point, e.g. uvicorn --factory app:create_asgi_app"""
+    start_app()
+    return AsgiApp(app)
+
+
+if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Homepage Service Dashboard")
     parser.add_argument(
@@ -824,6 +5627,106 @@ if __name__ == "__main__":
     parser.add_argument(
         "--host", type=str, default="0.0.0.0", help="Host to bind to (default: 0.0.0.0)"
     )
+    parser.add_argument(
+        "--server",
+        choices=["flask", "asgi"],
+        default="flask",
+        help="flask: the threaded development server; asgi: uvicorn serving "
+        "the ASGI app, with streaming endpoints (default: flask)",
+    )
+    parser.add_argument(
+        "--coordination-dir",
+        type=str,
+        default=COORDINATION_DIR,
+        help="Directory shared by all Homely nodes behind a load balancer",
+    )
+    parser.add_argument(
+        "--session-store",
+        choices=["cookie", "memory", "sqlite"],
+        default=SESSION_STORE,
+        help="cookie: signed cookie sessions; memory: server-side, one worker; "
+        f"sqlite: server-side in --session-db, shared by workers (default: {SESSION_STORE})",
+    )
+    parser.add_argument(
+        "--session-db",
+        type=str,
+        default=SESSION_DB,
+        help=f"SQLite file for --session-store sqlite (default: {SESSION_DB})",
+    )
+    parser.add_argument(
+        "--usage-auto-sort",
+        choices=sorted(USAGE_PERIODS),
+        help="Re-sort tiles within each column by clicks over this period",
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=str,
+        help="Restore all stores from this snapshot file before serving",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Enable admin request profiling (?profile=1 or X-Homely-Profile: 1)",
+    )
+    parser.add_argument(
+        "--profile-sample",
+        type=float,
+        default=0.0,
+        help="With --profile, also profile this fraction of all requests (0-1)",
+    )
+    parser.add_argument(
+        "--log-level",
+        type=str,
+        default=LOG_LEVEL,
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help=f"Log level (default: {LOG_LEVEL})",
+    )
+    parser.add_argument(
+        "--log-file", type=str, default=LOG_FILE, help="Log to a file instead of stdout"
+    )
+    parser.add_argument(
+        "--log-sample",
+        action="append",
+        default=[],
+        metavar="ROUTE=RATE",
+        help="Access log sampling rate for a route, e.g. /api/nuke-timestamp=0.01",
+    )
     args = parser.parse_args()
 
-    app.run(host=args.host, port=args.port, debug=True)
+    if args.server == "flask" and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        # The debug reloader's watcher: it only (re)starts a child process,
+        # which runs this block again, starts up and serves
+        app.run(host=args.host, port=args.port, debug=True)
+        sys.exit()
+
+    for spec in args.log_sample:
+        route, _, rate = spec.rpartition("=")
+        ACCESS_LOG_SAMPLING[route] = float(rate)
+    USAGE_AUTO_SORT = args.usage_auto_sort
+
+    def configure():
+        if args.snapshot:
+            try:
+                restore_snapshot_file(args.snapshot)
+            except (OSError, SnapshotError) as e:
+                parser.error(f"cannot restore {args.snapshot}: {e}")
+
+        configure_sessions(args.session_store, args.session_db)
+
+        if args.coordination_dir:
+            configure_coordination(args.coordination_dir)
+
+        if args.profile:
+            enable_profiling(args.profile_sample)
+
+    start_app(args.log_level, args.log_file, configure)
+
+    if args.server == "asgi":
+        try:
+            import uvicorn
+        except ImportError:
+            parser.error("--server asgi needs uvicorn (pip install uvicorn)")
+        # Keep Homely's JSON logging instead of uvicorn's own config
+        uvicorn.run(AsgiApp(app), host=args.host, port=args.port, log_config=None)
+    else:
+        app.run(host=args.host, port=args.port, debug=True)
@@ -0,0 +1,157 @@
+// Homely service worker: keeps the dashboard usable while the server is
+// rebooting or the network is down.
+//
+// - The page shell, CSS and fonts are precached and served
+//   stale-while-revalidate.
+// - The read-only data endpoints are served from cache immediately and
+//   revalidated in the background with If-None-Match. The server answers
+//   304 when its version tag is unchanged, so only changed data is
+//   downloaded. Open pages are told when an endpoint changed.
+// - The admin page and all writes always go straight to the network.
+
+const CACHE_VERSION = 'v1';
+const SHELL_CACHE = `homely-shell-${CACHE_VERSION}`;
+const API_CACHE = `homely-api-${CACHE_VERSION}`;
+
+const SHELL_URLS = [
+    '/',
+    '/kiosk',
+    '/static/all.css',
+    '/favicon.svg',
+    '/static/webfonts/fa-solid-900.woff2',
+    '/static/webfonts/fa-regular-400.woff2',
+    '/static/webfonts/fa-brands-400.woff2',
+    '/static/webfonts/fa-v4compatibility.woff2',
+];
+const CROSS_ORIGIN_SHELL_URLS = [
+    'https://cdn.socket.io/4.5.4/socket.io.min.js',
+];
+const API_PATHS = ['/api/services', '/api/calendar-config', '/api/calendar/settings', '/api/quote'];
+const API_PREFIXES = ['/api/calendar/months/'];
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const cache = await caches.open(SHELL_CACHE);
+        await cache.addAll(SHELL_URLS);
+        // The CDN script is nice to have offline but must not block install
+        await Promise.all(CROSS_ORIGIN_SHELL_URLS.map(async url => {
+            try {
+                const request = new Request(url, { mode: 'no-cors' });
+                await cache.put(request, await fetch(request));
+            } catch (error) {
+                console.warn('Could not precache', url, error);
+            }
+        }));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const keep = new Set([SHELL_CACHE, API_CACHE]);
+        const names = await caches.keys();
+        await Promise.all(names.filter(name => name.startsWith('homely-') && !keep.has(name))
+            .map(name => caches.delete(name)));
+        await self.clients.claim();
+    })());
+});
+
+function fromAdminPage(request) {
+    try {
+        return new URL(request.referrer).pathname.startsWith('/admin');
+    } catch (error) {
+        return false;
+    }
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        if (CROSS_ORIGIN_SHELL_URLS.includes(request.url)) {
+            event.respondWith(cacheFirst(request));
+        }
+        return;
+    }
+
+    if (API_PATHS.includes(url.pathname) || API_PREFIXES.some(prefix => url.pathname.startsWith(prefix))) {
+        // Admins edit what they load, so they never see a stale copy
+        if (fromAdminPage(request)) return;
+        event.respondWith(staleWhileRevalidateApi(event, request));
+    } else if (SHELL_URLS.includes(url.pathname) || url.pathname.startsWith('/static/webfonts/')) {
+        event.respondWith(staleWhileRevalidateShell(event, request));
+    }
+});
+
+async function cacheFirst(request) {
+    const cached = await caches.match(request, { cacheName: SHELL_CACHE });
+    return cached || fetch(request);
+}
+
+async function staleWhileRevalidateShell(event, request) {
+    const cache = await caches.open(SHELL_CACHE);
+    const cached = await cache.match(request);
+    const network = fetch(request).then(response => {
+        if (response.ok) {
+            return cache.put(request, response.clone()).then(() => response);
+        }
+        return response;
+    });
+
+    if (cached) {
+        event.waitUntil(network.catch(() => {}));
+        return cached;
+    }
+    return network;
+}
+
+async function staleWhileRevalidateApi(event, request) {
+    const cache = await caches.open(API_CACHE);
+    const cached = await cache.match(request);
+
+    if (!cached) {
+        try {
+            const response = await fetch(request);
+            if (response.ok) {
+                await cache.put(request, response.clone());
+            }
+            return response;
+        } catch (error) {
+            return offlineResponse();
+        }
+    }
+
+    event.waitUntil(revalidate(cache, request, cached));
+    return cached;
+}
+
+async function revalidate(cache, request, cached) {
+    const headers = new Headers(request.headers);
+    const etag = cached.headers.get('ETag');
+    if (etag) {
+        headers.set('If-None-Match', etag);
+    }
+
+    let response;
+    try {
+        response = await fetch(request.url, { headers, credentials: 'include', cache: 'no-store' });
+    } catch (error) {
+        return;  // Still offline, keep serving the cached copy
+    }
+    if (response.status === 304 || !response.ok) return;
+    if (etag && response.headers.get('ETag') === etag) return;
+
+    await cache.put(request, response);
+    const clients = await self.clients.matchAll({ type: 'window' });
+    const path = new URL(request.url).pathname;
+    clients.forEach(client => client.postMessage({ type: 'api-updated', path }));
+}
+
+function offlineResponse() {
+    return new Response(JSON.stringify({ success: false, error: 'Server is unreachable' }), {
+        status: 503,
+        headers: { 'Content-Type': 'application/json' },
+    });
+}
@@ -0,0 +1,93 @@
+"""Fixtures for running Homely against a throwaway data directory"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_throughput = []
+
+
+@pytest.fixture(scope="session")
+def homely_module(tmp_path_factory):
+    """The app module, imported from inside an empty directory
+
+    Data files are read and written relative to the current directory,
+    so nothing the module does may ever run in the repository itself.
+    """
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("boot"))
+    try:
+        module = importlib.import_module("app")
+    finally:
+        os.chdir(cwd)
+    yield module
+    module.stop_store_watcher()
+
+
+@pytest.fixture
+def homely(homely_module, tmp_path, monkeypatch):
+    """The app module with all stores loaded from an empty tmp_path"""
+    module = homely_module
+    module.stop_store_watcher()
+    monkeypatch.chdir(tmp_path)
+    # Lets the watcher notice it was stopped without a long wait
+    monkeypatch.setattr(module, "STORE_POLL_INTERVAL", 0.05)
+    module._stores.clear()
+    module.start_store_watcher()
+    yield module
+    module.stop_store_watcher()
+
+
+@pytest.fixture
+def admin_client(homely):
+    """Test client logged in as admin"""
+    client = homely.app.test_client()
+    response = client.post("/admin/login", json={"password": homely.ADMIN_PASSWORD})
+    assert response.status_code == 200
+    return client
+
+
+@pytest.fixture
+def record_throughput():
+    """record(name, operations, seconds) adds a line to the throughput report"""
+
+    def record(name, operations, seconds):
+        _throughput.append((name, operations, seconds))
+
+    return record
+
+
+def run_threads(count, target):
+    """Run target(n) on count threads started together; re-raise the first error"""
+    barrier = threading.Barrier(count)
+
+    def worker(n):
+        barrier.wait()
+        target(n)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        futures = [pool.submit(worker, n) for n in range(count)]
+    elapsed = time.perf_counter() - started
+    for future in futures:
+        future.result()
+    return elapsed
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _throughput:
+        return
+    terminalreporter.section("throughput")
+    for name, operations, seconds in _throughput:
+        terminalreporter.write_line(
+            f"{name:<40} {operations:>6} ops in {seconds:6.2f} s"
+            f" = {operations / seconds:8.1f} ops/s"
+        )
@@ -0,0 +1,82 @@
+"""The ASGI bridge streams request and response bodies through"""
+
+import asyncio
+
+
+def echo_lines(environ, start_response):
+    """WSGI app answering each request line as soon as it is read"""
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    body = environ["wsgi.input"]
+    while line := body.readline():
+        yield line.upper()
+
+
+def run_asgi(asgi_app, scope, messages):
+    """Send messages to asgi_app; returns what it sent back"""
+    sent = []
+
+    async def main():
+        incoming = asyncio.Queue()
+        for message in messages:
+            incoming.put_nowait(message)
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi_app(scope, incoming.get, send)
+
+    asyncio.run(main())
+    return sent
+
+
+def http_scope(headers=()):
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/echo",
+        "query_string": b"",
+        "headers": list(headers),
+    }
+
+
+def test_bodies_are_streamed_chunk_by_chunk(homely):
+    asgi_app = homely.AsgiApp(echo_lines)
+    messages = [
+        {"type": "http.request", "body": b"one\ntw", "more_body": True},
+        {"type": "http.request", "body": b"o\n", "more_body": True},
+        {"type": "http.request", "body": b"three\n", "more_body": False},
+    ]
+    try:
+        sent = run_asgi(asgi_app, http_scope(), messages)
+    finally:
+        asgi_app.executor.shutdown()
+
+    assert sent[0]["type"] == "http.response.start"
+    assert sent[0]["status"] == 200
+    bodies = [message["body"] for message in sent[1:]]
+    assert bodies == [b"ONE\n", b"TWO\n", b"THREE\n", b""]
+    assert [message.get("more_body", False) for message in sent[1:]] == [
+        True,
+        True,
+        True,
+        False,
+    ]
+
+
+def test_declared_bodies_over_the_limit_are_refused(homely):
+    asgi_app = homely.AsgiApp(echo_lines)
+    length = str(homely.ASGI_MAX_BODY_BYTES + 1).encode()
+    try:
+        sent = run_asgi(asgi_app, http_scope([(b"content-length", length)]), [])
+    finally:
+        asgi_app.executor.shutdown()
+    assert sent[0]["status"] == 413
+
+
+def test_websockets_are_closed(homely):
+    asgi_app = homely.AsgiApp(echo_lines)
+    try:
+        sent = run_asgi(asgi_app, {"type": "websocket", "path": "/"}, [])
+    finally:
+        asgi_app.executor.shutdown()
+    assert sent == [{"type": "websocket.close"}]
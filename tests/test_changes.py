@@ -0,0 +1,39 @@
+"""Change feed bookkeeping under concurrent store swaps"""
+
+import threading
+
+
+def test_late_listener_never_stores_older_digests(homely, monkeypatch):
+    homely.get_store("suggestions")
+    homely.prime_change_feed()
+    older = [{"id": 1, "text": "Older", "votes": 0}]
+    newer = [{"id": 1, "text": "Newer", "votes": 0}]
+    entered, proceed = threading.Event(), threading.Event()
+    store_entities = homely.store_entities
+
+    def slow_store_entities(store, data):
+        if data is older:
+            entered.set()
+            proceed.wait(timeout=5)
+        return store_entities(store, data)
+
+    monkeypatch.setattr(homely, "store_entities", slow_store_entities)
+
+    # The older swap's listener is still digesting when the newer swap lands
+    homely._stores["suggestions"] = dict(homely._stores["suggestions"], data=older)
+    first = threading.Thread(target=homely.record_change, args=("suggestions",))
+    first.start()
+    assert entered.wait(timeout=5)
+    homely._stores["suggestions"] = dict(homely._stores["suggestions"], data=newer)
+    second = threading.Thread(target=homely.record_change, args=("suggestions",))
+    second.start()
+    second.join(timeout=0.2)
+    proceed.set()
+    first.join()
+    second.join()
+
+    revision = homely.current_revision()
+    homely._stores["suggestions"] = dict(homely._stores["suggestions"], data=older)
+    homely.record_change("suggestions")
+    _, changes = homely.changes_since(revision)
+    assert changes["suggestions"]["changed"] == ["1"]
@@ -0,0 +1,86 @@
+"""Coordination between nodes sharing a directory"""
+
+import glob
+import json
+import os
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def shared(homely, tmp_path, monkeypatch):
+    """A shared-directory coordinator, without its polling thread"""
+    coordinator = homely.SharedDirectoryCoordinator(str(tmp_path / "shared"))
+    monkeypatch.setattr(homely, "coordinator", coordinator)
+    monkeypatch.setattr(homely, "_applied_store_changes", {})
+    return coordinator
+
+
+def test_vote_on_missing_suggestion_starts_no_cooldown(homely):
+    client = homely.app.test_client()
+    assert (
+        client.post("/api/suggestions/1/vote", json={"type": "up"}).status_code == 404
+    )
+    client.post("/api/suggestions", json={"suggestion": "Dark mode"})
+    response = client.post("/api/suggestions/1/vote", json={"type": "up"})
+    assert response.status_code == 200
+    response = client.post("/api/suggestions/1/vote", json={"type": "up"})
+    assert response.status_code == 429
+
+
+def test_events_carry_the_revision_not_the_files(homely, shared):
+    client = homely.app.test_client()
+    client.post("/api/suggestions", json={"suggestion": "Dark mode"})
+
+    (name,) = os.listdir(shared.events_dir)
+    with open(os.path.join(shared.events_dir, name), encoding="utf-8") as f:
+        event = json.load(f)
+    assert "files" not in event
+    assert event["revision"] == homely.current_revision()
+    assert event["changed"] is None or "1" in event["changed"]
+
+    node, revision, files = shared.get_store("suggestions")
+    assert (node, revision) == (homely.WORKER_ID, event["revision"])
+    assert json.loads(files[0])[0]["text"] == "Dark mode"
+
+
+def test_peer_changes_are_applied_once(homely, shared):
+    suggestions = [{"id": 7, "text": "From a peer", "votes": 0}]
+    shared.put_store("suggestions", 42, [json.dumps(suggestions)])
+    event = {"type": "store", "store": "suggestions", "revision": 42}
+
+    homely.apply_store_event(event)
+    assert homely.get_store("suggestions") == suggestions
+    assert not os.listdir(shared.events_dir)  # Not echoed back
+
+    # A repeated event for files already applied leaves the store alone
+    os.remove(homely.SUGGESTIONS_FILE)
+    homely.apply_store_event(event)
+    assert not os.path.exists(homely.SUGGESTIONS_FILE)
+
+
+def test_peer_changes_wait_for_a_save_in_progress(homely, shared):
+    suggestions = [{"id": 7, "text": "From a peer", "votes": 0}]
+    shared.put_store("suggestions", 42, [json.dumps(suggestions)])
+    event = {"type": "store", "store": "suggestions", "revision": 42}
+
+    with homely._suggestions_lock:
+        applier = threading.Thread(target=homely.apply_store_event, args=(event,))
+        applier.start()
+        applier.join(timeout=0.2)
+        assert applier.is_alive()
+        assert not os.path.exists(homely.SUGGESTIONS_FILE)
+    applier.join()
+    assert homely.get_store("suggestions") == suggestions
+
+
+def test_peer_services_are_backed_up_first(homely, admin_client, shared):
+    service = {"name": "Wiki", "url": "http://wiki.lan"}
+    admin_client.post("/api/services", json={"services": [service]})
+    backups = glob.glob(f"{homely.CONFIG_FILE}.backup.*")
+
+    shared.put_store("services", 42, [json.dumps({"services": []})])
+    homely.apply_store_event({"type": "store", "store": "services", "revision": 42})
+    assert homely.get_store("services") == []
+    assert len(glob.glob(f"{homely.CONFIG_FILE}.backup.*")) == len(backups) + 1
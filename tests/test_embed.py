@@ -0,0 +1,15 @@
+"""Background checks of whether iframe URLs can be embedded"""
+
+
+def test_unexpected_embed_check_error_is_recorded(homely_module, monkeypatch):
+    url = "http://embed.lan/"
+
+    def broken(url):
+        raise ValueError("malformed header")
+
+    monkeypatch.setattr(homely_module, "fetch_frame_policy", broken)
+    homely_module._embed_pending.add(url)
+    homely_module.check_embed_policy(url)
+    assert url not in homely_module._embed_pending
+    assert homely_module.embed_verdict(url, "http://homely.lan/") is None
+    homely_module._embed_policies.pop(url)
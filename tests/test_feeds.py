@@ -0,0 +1,121 @@
+"""Feed cache tests against a local HTTP stand-in for a feed server"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from conftest import run_threads
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Stand-in</title>
+<item><title>First</title><link>http://example.lan/1</link></item>
+<item><title>Second</title><link>http://example.lan/2</link></item>
+</channel></rss>"""
+
+
+class FeedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FeedHandler)
+        self.hits = 0
+        self.not_modified = 0
+        self.status = 200
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/feed.xml"
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+        if server.status != 200:
+            self.send_response(server.status)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            with server.lock:
+                server.not_modified += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(RSS)))
+        self.end_headers()
+        self.wfile.write(RSS)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feed_server(homely_module):
+    homely_module._feed_cache.clear()
+    server = FeedServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_readers_share_one_fetch(homely_module, feed_server):
+    entries = []
+
+    def read(n):
+        entries.append(homely_module.get_feed(feed_server.url, 60))
+
+    run_threads(20, read)
+    assert feed_server.hits == 1
+    assert all(entry is entries[0] for entry in entries)
+    assert [item["title"] for item in entries[0]["items"]] == ["First", "Second"]
+
+
+def test_stale_feed_is_revalidated(homely_module, feed_server):
+    first = homely_module.get_feed(feed_server.url, 0)
+    second = homely_module.get_feed(feed_server.url, 0)
+    assert feed_server.not_modified == 1
+    assert second["version"] == first["version"]
+    assert second["items"] == first["items"]
+
+
+def test_failed_fetch_keeps_previous_items(homely_module, feed_server):
+    first = homely_module.get_feed(feed_server.url, 0)
+    feed_server.status = 500
+    failed = homely_module.get_feed(feed_server.url, 0)
+    assert failed["error"] == "HTTP 500"
+    assert failed["items"] == first["items"]
+
+
+def test_unexpected_fetch_error_is_cached(homely_module, feed_server, monkeypatch):
+    first = homely_module.get_feed(feed_server.url, 0)
+    del first["etag"]  # Fetch the whole feed again rather than a 304
+
+    def broken(body, base_url):
+        raise UnicodeDecodeError("utf-8", body, 0, 1, "invalid start byte")
+
+    monkeypatch.setattr(homely_module, "parse_feed", broken)
+    failed = homely_module.get_feed(feed_server.url, 0)
+    assert failed["error"] == "Feed could not be read"
+    assert failed["items"] == first["items"]
+    assert homely_module.get_feed(feed_server.url, 60) is failed
+
+
+def test_only_web_links_are_kept(homely_module):
+    rss = b"""<rss version="2.0"><channel><title>Hostile</title>
+<item><title>Script</title><link>javascript:alert(document.cookie)</link></item>
+<item><title>Data</title><link> data:text/html,&lt;script&gt;</link></item>
+<item><title>Relative</title><link>/posts/1</link></item>
+</channel></rss>"""
+    _, items = homely_module.parse_feed(rss, "https://blog.lan/feed.xml")
+    assert [item["link"] for item in items] == ["", "", "https://blog.lan/posts/1"]
+
+    json_feed = b'{"items": [{"url": "JavaScript:alert(1)"}, {"url": "post"}]}'
+    _, items = homely_module.parse_feed(json_feed, "https://blog.lan/feed.json")
+    assert [item["link"] for item in items] == ["", "https://blog.lan/post"]
@@ -0,0 +1,15 @@
+"""Liveness and readiness probes"""
+
+
+def test_readiness_does_not_read_unloaded_stores(homely, monkeypatch):
+    def no_disk_reads(*args, **kwargs):
+        raise AssertionError("readiness probe read a store file")
+
+    monkeypatch.setattr(homely, "read_json_file", no_disk_reads)
+    monkeypatch.setattr(homely, "run_deep_health_check", no_disk_reads)
+    monkeypatch.setitem(homely._startup, "ready", True)
+    monkeypatch.setattr(homely, "get_store_status", dict)
+
+    response = homely.app.test_client().get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.get_json()["not_loaded"] == sorted(homely.get_store_files())
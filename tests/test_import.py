@@ -0,0 +1,147 @@
+"""Bulk import of tiles and quotes"""
+
+import json
+import os
+import time
+
+import pytest
+
+HOMER = """
+services:
+  - name: Media
+    items:
+      - name: Jellyfin
+        subtitle: Movies
+        url: http://jellyfin.lan
+        icon: fas fa-film
+      - name: Sonarr
+        url: http://sonarr.lan
+  - name: Network
+    items:
+      - name: Router
+        url: http://router.lan
+        logo: assets/router.png
+"""
+
+
+def post(client, target, body, **params):
+    query = "&".join(f"{key}={value}" for key, value in params.items())
+    return client.post(f"/api/admin/import/{target}?{query}", data=body)
+
+
+def saved_services(homely):
+    with open(homely.CONFIG_FILE, encoding="utf-8") as f:
+        return json.load(f)["services"]
+
+
+def test_csv_rows_are_validated_and_deduplicated(homely, admin_client):
+    body = (
+        "name,url,column,description\n"
+        "Grafana,http://grafana.lan,1,Dashboards\n"
+        "Grafana again,HTTP://Grafana.lan/,2,\n"
+        ",http://nameless.lan,0,\n"
+        "Prometheus,http://prometheus.lan,9,\n"
+    )
+    response = post(admin_client, "services", body, format="csv")
+    report = response.get_json()
+    assert response.status_code == 200
+    assert (report["rows"], report["imported"], report["duplicates"]) == (4, 2, 1)
+    assert report["error_count"] == 1
+    assert report["errors"][0].startswith("Row 3: name")
+
+    services = saved_services(homely)
+    assert [s["name"] for s in services] == ["Grafana", "Prometheus"]
+    assert services[1]["column"] == 2  # Clamped
+    assert len({s["id"] for s in services}) == 2
+
+    # Importing the same file again adds nothing and writes nothing
+    response = post(admin_client, "services", body, format="csv")
+    assert response.get_json()["imported"] == 0
+    assert homely.count_backups() == 0
+
+
+def test_homer_config(homely, admin_client):
+    pytest.importorskip("yaml")
+    response = post(admin_client, "services", HOMER, format="yaml")
+    assert response.get_json()["imported"] == 3
+    services = saved_services(homely)
+    assert [(s["name"], s["column"]) for s in services] == [
+        ("Jellyfin", 0),
+        ("Sonarr", 0),
+        ("Router", 1),
+    ]
+    assert services[0]["description"] == "Movies"
+    assert services[0]["icon"] == "fas fa-film"
+    assert "icon" not in services[2]
+
+
+def test_heimdall_export_and_dry_run(homely, admin_client):
+    apps = [{"title": f"App {n}", "url": f"http://app{n}.lan"} for n in range(3)]
+    body = json.dumps(apps)
+    response = post(admin_client, "services", body, format="json", dry_run=1)
+    assert response.get_json()["imported"] == 3
+    assert not os.path.exists(homely.CONFIG_FILE)
+
+    response = post(admin_client, "services", body, format="json")
+    assert [s["name"] for s in saved_services(homely)] == ["App 0", "App 1", "App 2"]
+
+
+def test_replace_mode_keeps_export_ids(homely, admin_client):
+    export = {
+        "services": [
+            {"id": "keep-me", "type": "notes", "name": "Notes", "column": 1},
+            {"id": "link", "type": "url", "name": "Wiki", "url": "http://wiki.lan"},
+        ]
+    }
+    post(
+        admin_client,
+        "services",
+        json.dumps({"services": [{"name": "Old", "url": "http://old.lan"}]}),
+    )
+    response = post(admin_client, "services", json.dumps(export), mode="replace")
+    assert response.get_json()["imported"] == 2
+    assert [s["id"] for s in saved_services(homely)] == ["keep-me", "link"]
+
+
+def test_large_import_is_one_write(homely, admin_client):
+    body = "".join(
+        json.dumps({"text": f"Quote number {n}", "author": "Anon"}) + "\n"
+        for n in range(5000)
+    )
+    started = time.perf_counter()
+    response = post(admin_client, "quotes", body, format="jsonl")
+    elapsed = time.perf_counter() - started
+    report = response.get_json()
+    assert response.status_code == 200, report
+    assert report["imported"] == 5000
+    assert elapsed < 10
+    with open(homely.CALENDAR_CONFIG_FILE, encoding="utf-8") as f:
+        assert len(json.load(f)["quotes"]) == 5000
+
+
+def test_text_quotes_skip_duplicates(homely, admin_client):
+    body = "Stay curious\n\n  stay   CURIOUS \nShip it\n"
+    report = post(admin_client, "quotes", body, format="text").get_json()
+    assert (report["imported"], report["duplicates"]) == (2, 1)
+    report = post(admin_client, "quotes", "Ship it\n", format="text").get_json()
+    assert (report["imported"], report["duplicates"]) == (0, 1)
+
+
+def test_bad_uploads_are_refused(homely, admin_client, monkeypatch):
+    assert post(admin_client, "services", "{nope", format="json").status_code == 400
+    assert post(admin_client, "services", "x", format="xml").status_code == 400
+    assert post(admin_client, "services", "a\n", format="text").status_code == 400
+    monkeypatch.setattr(homely, "IMPORT_MAX_BYTES", 10)
+    response = post(admin_client, "quotes", "a much longer line\n", format="text")
+    assert response.status_code == 413
+    anonymous = homely.app.test_client()
+    assert post(anonymous, "quotes", "hi\n", format="text").status_code == 401
+
+
+def test_bad_service_types_are_row_errors(homely, admin_client):
+    rows = [{"type": ["x"], "name": "A"}, {"type": {"t": 1}}, {"type": "nope"}]
+    response = post(admin_client, "services", json.dumps(rows), format="json")
+    report = response.get_json()
+    assert response.status_code == 200
+    assert (report["imported"], report["error_count"]) == (0, 3)
+    assert all("type must be one of" in error for error in report["errors"])
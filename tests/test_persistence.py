@@ -0,0 +1,333 @@
+"""Concurrency stress and property tests for the JSON persistence layer
+
+Many threads hammer the read-modify-write endpoints at once, then the
+files on disk are checked against what the clients were told. The
+throughput of each run is reported at the end of the session, as a
+baseline for scaling work.
+"""
+
+import json
+import os
+import random
+import threading
+
+import pytest
+from conftest import run_threads
+
+THREADS = 8
+
+
+def url_service(n):
+    return {
+        "id": f"svc-{n}",
+        "name": f"Service {n}",
+        "type": "url",
+        "url": f"http://host-{n}.lan",
+        "column": n % 3,
+        "description": "",
+    }
+
+
+def read_file(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_concurrent_votes_are_not_lost(homely, monkeypatch, record_throughput):
+    monkeypatch.setattr(homely, "VOTE_COOLDOWN", 0)
+    client = homely.app.test_client()
+    suggestion = client.post("/api/suggestions", json={"suggestion": "More tiles"})
+    suggestion_id = suggestion.get_json()["suggestion"]["id"]
+    votes_per_thread = 25
+    accepted = {"up": 0, "down": 0}
+    lock = threading.Lock()
+
+    def vote(n):
+        voter = homely.app.test_client()
+        vote_type = "up" if n % 2 else "down"
+        for _ in range(votes_per_thread):
+            response = voter.post(
+                f"/api/suggestions/{suggestion_id}/vote", json={"type": vote_type}
+            )
+            assert response.status_code == 200, response.get_json()
+            with lock:
+                accepted[vote_type] += 1
+
+    elapsed = run_threads(THREADS, vote)
+    record_throughput("votes", THREADS * votes_per_thread, elapsed)
+
+    (saved,) = read_file(homely.SUGGESTIONS_FILE)
+    assert saved["upvotes"] == accepted["up"]
+    assert saved["downvotes"] == accepted["down"]
+    assert saved["score"] == accepted["up"] - accepted["down"]
+
+
+def test_suggestion_ids_stay_unique(homely, admin_client, record_throughput):
+    per_thread = 20
+    created = []
+    lock = threading.Lock()
+
+    def submit(n):
+        client = homely.app.test_client()
+        for i in range(per_thread):
+            response = client.post(
+                "/api/suggestions", json={"suggestion": f"idea {n}-{i}"}
+            )
+            assert response.status_code == 200
+            with lock:
+                created.append(response.get_json()["suggestion"]["id"])
+
+    elapsed = run_threads(THREADS, submit)
+    record_throughput("suggestion submissions", THREADS * per_thread, elapsed)
+    assert len(set(created)) == len(created)
+
+    # A delete must not make the next submission collide with a live ID
+    assert admin_client.delete(f"/api/suggestions/{min(created)}").status_code == 200
+    response = admin_client.post("/api/suggestions", json={"suggestion": "after"})
+    assert response.get_json()["suggestion"]["id"] not in created[1:]
+
+    ids = [s["id"] for s in read_file(homely.SUGGESTIONS_FILE)]
+    assert len(ids) == len(set(ids)) == len(created)
+
+
+def test_services_file_never_missing_while_saving(
+    homely, admin_client, record_throughput
+):
+    saves_per_thread = 10
+    payloads = [[url_service(n) for n in range(k + 1)] for k in range(THREADS)]
+    stop = threading.Event()
+    problems = []
+
+    def watch():
+        while not stop.is_set():
+            try:
+                read_file(homely.CONFIG_FILE)
+            except (OSError, ValueError) as e:
+                problems.append(repr(e))
+
+    def save(n):
+        client = homely.app.test_client()
+        with client.session_transaction() as session:
+            session["admin_authenticated"] = True
+        for _ in range(saves_per_thread):
+            response = client.post("/api/services", json={"services": payloads[n]})
+            assert response.status_code == 200, response.get_json()
+
+    assert (
+        admin_client.post("/api/services", json={"services": payloads[0]}).status_code
+        == 200
+    )
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    try:
+        elapsed = run_threads(THREADS, save)
+    finally:
+        stop.set()
+        watcher.join()
+    record_throughput("services saves", THREADS * saves_per_thread, elapsed)
+
+    assert problems == []
+    assert read_file(homely.CONFIG_FILE)["services"] in payloads
+    assert homely.count_backups() == 5
+    for name in os.listdir("."):
+        if name.startswith(f"{homely.CONFIG_FILE}.backup."):
+            assert read_file(name)["services"] in payloads
+
+
+def test_backups_stay_bounded(homely, admin_client):
+    for n in range(12):
+        response = admin_client.post(
+            "/api/services", json={"services": [url_service(n)]}
+        )
+        assert response.status_code == 200
+    assert homely.count_backups() == 5
+    backups = sorted(
+        name
+        for name in os.listdir(".")
+        if name.startswith(f"{homely.CONFIG_FILE}.backup.")
+    )
+    # The newest backup holds the save before the last one
+    assert read_file(backups[-1])["services"] == [url_service(10)]
+
+
+def test_concurrent_deletes_by_position(homely, admin_client, record_throughput):
+    services = [url_service(n) for n in range(40)]
+    assert (
+        admin_client.post("/api/services", json={"services": services}).status_code
+        == 200
+    )
+    deleted = []
+    lock = threading.Lock()
+
+    def delete(n):
+        client = homely.app.test_client()
+        with client.session_transaction() as session:
+            session["admin_authenticated"] = True
+        rng = random.Random(n)
+        for _ in range(10):
+            current = client.get("/api/services").get_json()["services"]
+            if not current:
+                return
+            index = rng.randrange(len(current))
+            target = current[index]["id"]
+            response = client.delete(f"/api/services/{index}?id={target}")
+            assert response.status_code in (200, 404, 409)
+            if response.status_code == 200:
+                with lock:
+                    deleted.append(target)
+
+    elapsed = run_threads(THREADS, delete)
+    record_throughput("service deletes", THREADS * 10, elapsed)
+
+    # Only the tiles a client was told it deleted are gone
+    assert len(deleted) == len(set(deleted))
+    remaining = [s["id"] for s in read_file(homely.CONFIG_FILE)["services"]]
+    expected = [s["id"] for s in services if s["id"] not in deleted]
+    assert remaining == expected
+
+
+def test_delete_refuses_moved_tile(homely, admin_client):
+    services = [url_service(n) for n in range(3)]
+    assert (
+        admin_client.post("/api/services", json={"services": services}).status_code
+        == 200
+    )
+    response = admin_client.delete("/api/services/0?id=svc-2")
+    assert response.status_code == 409
+    assert len(read_file(homely.CONFIG_FILE)["services"]) == 3
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_suggestions_match_model(homely, admin_client, monkeypatch, seed):
+    """Random operation sequences leave the file equal to a simple model"""
+    monkeypatch.setattr(homely, "VOTE_COOLDOWN", 0)
+    rng = random.Random(seed)
+    model = {}
+    for step in range(60):
+        operation = rng.choice(["submit", "submit", "vote", "edit", "delete"])
+        target = rng.choice(sorted(model)) if model else rng.randint(1, 5)
+        if operation == "submit":
+            response = admin_client.post(
+                "/api/suggestions", json={"suggestion": f"s{step}"}
+            )
+            suggestion = response.get_json()["suggestion"]
+            assert suggestion["id"] not in model
+            model[suggestion["id"]] = {"text": f"s{step}", "up": 0, "down": 0}
+        elif operation == "vote":
+            vote_type = rng.choice(["up", "down"])
+            response = admin_client.post(
+                f"/api/suggestions/{target}/vote", json={"type": vote_type}
+            )
+            assert response.status_code == (200 if target in model else 404)
+            if target in model:
+                model[target][vote_type] += 1
+        elif operation == "edit":
+            response = admin_client.put(
+                f"/api/suggestions/{target}", json={"text": f"e{step}"}
+            )
+            assert response.status_code == (200 if target in model else 404)
+            if target in model:
+                model[target]["text"] = f"e{step}"
+        else:
+            response = admin_client.delete(f"/api/suggestions/{target}")
+            assert response.status_code == (200 if target in model else 404)
+            model.pop(target, None)
+
+        saved = {
+            s["id"]: {
+                "text": s["text"],
+                "up": s.get("upvotes", 0),
+                "down": s.get("downvotes", 0),
+            }
+            for s in (
+                read_file(homely.SUGGESTIONS_FILE)
+                if os.path.exists(homely.SUGGESTIONS_FILE)
+                else []
+            )
+        }
+        assert saved == model
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_note_edits_match_sequential_splices(homely_module, seed):
+    """Edits against one base text equal applying them back to front"""
+    rng = random.Random(seed)
+    content = "".join(rng.choice("abc \n") for _ in range(rng.randint(0, 40)))
+    cuts = sorted(rng.sample(range(len(content) + 1), k=min(6, len(content) + 1)))
+    edits = [
+        {"start": cuts[i], "end": cuts[i + 1], "text": rng.choice(["", "x", "yz"])}
+        for i in range(0, len(cuts) - 1, 2)
+    ]
+    expected = content
+    for edit in reversed(edits):
+        expected = expected[: edit["start"]] + edit["text"] + expected[edit["end"] :]
+    shuffled = rng.sample(edits, k=len(edits))
+    assert homely_module.apply_note_edits(content, shuffled) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_usage_sort_properties(homely_module, seed):
+    """Sorting by clicks only permutes counted tiles within their column"""
+    homely = homely_module
+    rng = random.Random(seed)
+    services = [
+        {
+            "id": f"t{n}",
+            "type": rng.choice(["url", "url-group", "search", "notes", "calendar"]),
+            "column": rng.randrange(3),
+        }
+        for n in range(rng.randint(0, 25))
+    ]
+    totals = {s["id"]: rng.randrange(5) for s in services if rng.random() < 0.7}
+    ordered = homely.sort_services_by_usage(services, totals)
+
+    assert sorted(s["id"] for s in ordered) == sorted(s["id"] for s in services)
+    for before, after in zip(services, ordered):
+        counted = before["type"] in homely.USAGE_TILE_TYPES
+        assert (after["type"] in homely.USAGE_TILE_TYPES) == counted
+        assert after["column"] == before["column"]
+        if not counted:
+            assert after is before
+    for column in range(3):
+        clicks = [
+            totals.get(s["id"], 0)
+            for s in ordered
+            if s["column"] == column and s["type"] in homely.USAGE_TILE_TYPES
+        ]
+        assert clicks == sorted(clicks, reverse=True)
+
+
+def test_read_throughput_while_writing(homely, admin_client, record_throughput):
+    """Readers are served from memory while a writer keeps saving"""
+    assert (
+        admin_client.post(
+            "/api/services", json={"services": [url_service(0)]}
+        ).status_code
+        == 200
+    )
+    reads_per_thread = 100
+    stop = threading.Event()
+
+    def write():
+        n = 1
+        while not stop.is_set():
+            admin_client.post("/api/services", json={"services": [url_service(n)]})
+            n += 1
+
+    def read(n):
+        client = homely.app.test_client()
+        for _ in range(reads_per_thread):
+            response = client.get("/api/services")
+            assert response.status_code == 200
+            assert len(response.get_json()["services"]) == 1
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        elapsed = run_threads(THREADS, read)
+    finally:
+        stop.set()
+        writer.join()
+    record_throughput(
+        "services reads during saves", THREADS * reads_per_thread, elapsed
+    )
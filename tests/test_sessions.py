@@ -0,0 +1,49 @@
+"""Server-side sessions and their tokens"""
+
+import pytest
+
+
+@pytest.fixture
+def memory_sessions(homely, monkeypatch):
+    monkeypatch.setattr(homely.app, "session_interface", homely.app.session_interface)
+    homely.configure_sessions("memory")
+    return homely.app.session_interface
+
+
+def session_token(client, homely):
+    cookie = client.get_cookie(homely.app.config["SESSION_COOKIE_NAME"])
+    return cookie and cookie.value
+
+
+def test_token_rotates_only_when_privileges_change(homely, memory_sessions):
+    client = homely.app.test_client()
+    client.post("/api/suggestions", json={"suggestion": "Dark mode"})
+    client.post("/api/suggestions/1/vote", json={"type": "up"})
+    visitor = session_token(client, homely)
+    assert visitor
+
+    client.post("/admin/login", json={"password": homely.ADMIN_PASSWORD})
+    admin = session_token(client, homely)
+    assert admin != visitor
+    assert memory_sessions.backend.load(visitor) is None
+
+    client.post("/admin/logout")
+    assert session_token(client, homely) not in (visitor, admin)
+    assert memory_sessions.backend.load(admin) is None
+
+
+def test_other_changes_keep_the_token(homely, memory_sessions):
+    client = homely.app.test_client()
+    client.post("/api/suggestions", json={"suggestion": "Dark mode"})
+    client.post("/admin/login", json={"password": homely.ADMIN_PASSWORD})
+    admin = session_token(client, homely)
+
+    # The first vote writes a client id into the admin's session
+    client.post("/api/suggestions/1/vote", json={"type": "up"})
+    assert session_token(client, homely) == admin
+    assert "client_id" in memory_sessions.backend.load(admin)[0]
+
+    # A parallel tab still carrying the token is still logged in
+    other_tab = homely.app.test_client()
+    other_tab.set_cookie(homely.app.config["SESSION_COOKIE_NAME"], admin)
+    assert b"Admin Login" not in other_tab.get("/admin").data
@@ -0,0 +1,31 @@
+"""Snapshot import of damaged or foreign files"""
+
+import hashlib
+import zlib
+
+import pytest
+
+
+def snapshot_with_manifest(homely, manifest):
+    header = homely.SNAPSHOT_HEADER.pack(
+        homely.SNAPSHOT_MAGIC, homely.SNAPSHOT_FORMAT_VERSION
+    )
+    records = homely._snapshot_record(
+        homely.SNAPSHOT_MANIFEST, "manifest", manifest
+    ) + homely.SNAPSHOT_RECORD.pack(
+        homely.SNAPSHOT_END, 0, 0, hashlib.sha256().digest()
+    )
+    return header + zlib.compress(records)
+
+
+@pytest.mark.parametrize(
+    "manifest", [b"{nope", b"\xff", b"[]", b'{"stores": 1}', b'{"stores": {"x": []}}']
+)
+def test_malformed_manifest_is_rejected(homely, admin_client, manifest):
+    response = admin_client.post(
+        "/api/snapshot", data=snapshot_with_manifest(homely, manifest)
+    )
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body["success"] is False
+    assert body["error"].startswith("Snapshot rejected: manifest")
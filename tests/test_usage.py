@@ -0,0 +1,38 @@
+"""Usage click counting and its periodic flush"""
+
+import os
+import time
+from collections import deque
+
+import pytest
+
+
+@pytest.fixture
+def clicks(homely, monkeypatch):
+    """The pending clicks, empty, with two clicks on t1 this hour queued"""
+    pending = deque(maxlen=homely.USAGE_MAX_PENDING)
+    monkeypatch.setattr(homely, "_usage_clicks", pending)
+    hour = int(time.time()) // 3600 * 3600
+    pending.extend([("t1", hour), ("t1", hour)])
+    return pending
+
+
+def test_failed_flush_keeps_the_clicks(homely, clicks, monkeypatch):
+    def unreadable():
+        raise PermissionError("usage_stats.json")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(homely, "read_usage_file", unreadable)
+        with pytest.raises(PermissionError):
+            homely.flush_usage()
+    assert len(clicks) == 2
+
+    homely.flush_usage()
+    assert not clicks
+    assert homely.usage_totals("day") == {"t1": 2}
+
+
+def test_totals_include_pending_clicks_without_a_flush(homely, clicks):
+    assert homely.usage_totals("day") == {"t1": 2}
+    assert len(clicks) == 2
+    assert not os.path.exists(homely.USAGE_FILE)
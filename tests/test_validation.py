@@ -0,0 +1,41 @@
+"""Request bodies of the wrong shape are refused with 400, never a 500"""
+
+import pytest
+
+
+@pytest.mark.parametrize("service_type", [["url"], {"url": 1}, 3, None])
+def test_service_type_must_be_a_known_name(admin_client, service_type):
+    service = {"name": "Wiki", "url": "http://wiki.lan", "type": service_type}
+    response = admin_client.post("/api/services", json={"services": [service]})
+    assert response.status_code == 400
+    assert "Service 1: type must be one of" in str(response.get_json())
+
+
+@pytest.mark.parametrize("body", ["[]", '"x"', "1", "null"])
+def test_note_patch_must_be_an_object(homely, admin_client, body):
+    note = {"id": "n1", "type": "notes", "name": "Notes", "column": 0}
+    assert (
+        admin_client.post("/api/services", json={"services": [note]}).status_code == 200
+    )
+    response = admin_client.patch(
+        "/api/notes/n1", data=body, content_type="application/json"
+    )
+    assert response.status_code == 400
+    assert "body: must be an object" in str(response.get_json())
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "body"),
+    [
+        ("patch", "/api/calendar/settings", "[]"),
+        ("patch", "/api/calendar/months/3", '"x"'),
+        ("put", "/api/calendar/quotes", "[1]"),
+        ("post", "/api/calendar/quotes", "null"),
+    ],
+)
+def test_calendar_bodies_must_be_objects(admin_client, method, path, body):
+    response = getattr(admin_client, method)(
+        path, data=body, content_type="application/json"
+    )
+    assert response.status_code == 400
+    assert "body: must be an object" in str(response.get_json())